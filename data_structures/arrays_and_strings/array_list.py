@@ -1,3 +1,25 @@
+import math
+import mmap
+import os
+import struct
+import time
+import tracemalloc
+from array import array
+
+
+# Header of MappedArrayList files: magic bytes, record size, capacity (in
+# records), committed length (in records) and record format string (of at
+# most _MAX_FORMAT_LENGTH ASCII characters, padded with null bytes)
+_MAPPED_MAGIC = b'MALIST01'
+_MAX_FORMAT_LENGTH = 32
+_MAPPED_HEADER = struct.Struct('<8sQQQ{}s'.format(_MAX_FORMAT_LENGTH))
+
+# Offsets of capacity and committed length within the header
+_CAPACITY_OFFSET = 16
+_LENGTH_OFFSET = 24
+_UINT64 = struct.Struct('<Q')
+
+
 class ArrayList():
     """This class implements a dynamically resizing array, with only some of
     the features of Python's built-in list.
@@ -6,42 +28,120 @@ class ArrayList():
     Idea is to practice creating a dynamically resizing array, treating
     Python's list object as if it were of a fixed size, and building
     'functionality' on top of it.
+
+    If a typecode is given, elements are instead stored unboxed in an
+    array.array of that type (e.g. 'd' for floats, 'q' for 64-bit integers),
+    which can be read without copying through to_memoryview, or through the
+    buffer protocol on Python 3.12+ (e.g. numpy.asarray(array_list)).
     """
 
-    def __init__(self, initial_length=2, resizing_factor=2):
+    def __init__(self, initial_length=2, resizing_factor=2, typecode=None):
         """Initialise object with empty list, with initial length as specified.
 
         Parameters
         ----------
         initial_length : int, optional
             Starting length of underlying list
-        resizing_factor : int, optional
+        resizing_factor : int or float, optional
             Factor by which to multiple underlying list length when list needs
-            resizing
+            resizing; can be fractional (e.g. 1.5), but must be above 1
+        typecode : str, optional
+            array module typecode to store elements as; None (default) to
+            store any Python object in a list
         """
+        self.typecode = typecode
 
         # Initialise underlying list, with no elements
-        self.main_list = [None] * initial_length
+        self.main_list = self._empty_storage(initial_length)
 
         # Initialise variable to store number of elements inserted into
         # main_list, which will always be less than or equal to list length
         self.num_elements = 0
 
+        if resizing_factor <= 1:
+            raise ValueError('resizing_factor must be greater than 1')
+
+        self.initial_length = initial_length
         self.resizing_factor = resizing_factor
 
-    def _expand_main_list(self):
-        """Expand list by resizing_factor
+        # Allocation telemetry: number of times main_list has been resized,
+        # and bytes of elements copied into resized lists
+        self.resize_count = 0
+        self.bytes_copied = 0
+
+        # Incremented whenever the number of elements changes, so that
+        # iterators and views can detect it and fail fast
+        self.modification_count = 0
+
+    def _empty_storage(self, length):
+        """Return underlying storage of given length, filled with None, or
+        zeros if typecode is set
+
+        Parameters
+        ----------
+        length : int
+            Number of elements
+
+        Returns
+        -------
+        list or array.array
+            New storage
+        """
+        if self.typecode is None:
+            return [None] * length
+
+        # Zero bytes are a valid zero value for every typecode
+        return array(self.typecode, bytes(
+            array(self.typecode).itemsize * length
+        ))
+
+    def _element_size(self):
+        """Return number of bytes main_list uses per element: the item size
+        for a typed array, or the size of a pointer for a list
+        """
+        if self.typecode is None:
+            return struct.calcsize('P')
+
+        return self.main_list.itemsize
+
+    def _resize_main_list(self, new_length):
+        """Change length of main_list to new_length, which must be at least
+        num_elements
+
+        With typecode set, raises BufferError while any memoryview of the
+        array is held, since the array can't be moved in memory then
+        """
+        change_in_length = new_length - len(self.main_list)
+
+        if change_in_length > 0:
+            self.main_list.extend(self._empty_storage(change_in_length))
+        elif change_in_length < 0:
+            del self.main_list[new_length:]
+        else:
+            return
+
+        # Treating main_list as fixed size, resizing means copying every
+        # element into a new list (Python's list may avoid this)
+        self.resize_count += 1
+        self.bytes_copied += self.num_elements * self._element_size()
+
+    def _expand_main_list(self, min_length=0):
+        """Expand list by resizing_factor, or to min_length if that is
+        longer, in one step
 
         E.g. For resizing_factor of 2, a list of length 10 will become a list
         of length 20
         """
 
-        # Compute how much to extend underlying list by
-        new_length = self.resizing_factor * len(self.main_list)
-        change_in_length = new_length - len(self.main_list)
+        # Compute new length, growing by at least one element, so fractional
+        # resizing factors still grow short lists
+        new_length = max(
+            int(math.ceil(self.resizing_factor * len(self.main_list))),
+            len(self.main_list) + 1,
+            min_length
+        )
 
-        # Entend underlying list
-        self.main_list.extend([None] * change_in_length)
+        self._resize_main_list(new_length)
 
     def append(self, data):
         """Add single data element to main_list, increasing its size if
@@ -63,17 +163,117 @@ class ArrayList():
 
         # Increment num elements counter
         self.num_elements += 1
+        self.modification_count += 1
 
     def extend(self, extension):
-        """Append extension values to main_list. Wraps this object's append
-        method.
+        """Append extension values to main_list. If extension has a length,
+        main_list is resized at most once, straight to a length that fits
+        all of them; otherwise wraps this object's append method.
+
         Parameters
         ----------
-        extension : list
-            List of Python objects to append to main_list
+        extension : iterable
+            Python objects to append to main_list
+        """
+        if not hasattr(extension, '__len__'):
+            for element in extension:
+                self.append(element)
+            return
+
+        start = self.num_elements
+        end = start + len(extension)
+
+        if end > len(self.main_list):
+            self._expand_main_list(end)
+
+        if self.typecode is not None:
+            extension = array(self.typecode, extension)
+
+        self.main_list[start:end] = extension
+
+        self.num_elements = end
+        self.modification_count += 1
+
+    def pop(self):
+        """Remove and return last element.
+
+        main_list is shrunk by resizing_factor once it is only
+        1 / resizing_factor**2 full (but not below its initial length). The
+        gap between the shrinking and growing thresholds stops alternating
+        appends and pops from resizing on every call. The shrink is skipped
+        while a memoryview of a typed main_list is held.
+
+        Returns
+        -------
+        Last element
         """
-        for element in extension:
-            self.append(element)
+        if self.num_elements == 0:
+            raise IndexError('pop from empty ArrayList')
+
+        self.num_elements -= 1
+        self.modification_count += 1
+
+        data = self.main_list[self.num_elements]
+        if self.typecode is None:
+            # Drop reference, so element can be garbage collected
+            self.main_list[self.num_elements] = None
+
+        capacity = len(self.main_list)
+        if (capacity > self.initial_length and
+                self.num_elements <= capacity / self.resizing_factor ** 2):
+            try:
+                self._resize_main_list(max(
+                    int(capacity / self.resizing_factor), self.initial_length,
+                    self.num_elements
+                ))
+            except BufferError:
+                # Array can't be resized under a memoryview; the element is
+                # already removed, so keep the spare capacity for now
+                pass
+
+        return data
+
+    def reserve(self, capacity):
+        """Resize main_list, in one step, so that it can hold capacity
+        elements without further resizing. Never shrinks main_list.
+
+        Parameters
+        ----------
+        capacity : int
+            Number of elements to make room for
+        """
+        if capacity > len(self.main_list):
+            self._resize_main_list(capacity)
+
+    def shrink_to_fit(self):
+        """Shrink main_list to hold exactly the current elements, giving
+        unused memory back
+        """
+        self._resize_main_list(self.num_elements)
+
+    def capacity(self):
+        """Return number of elements main_list can hold before resizing
+        """
+        return len(self.main_list)
+
+    def stats(self):
+        """Return allocation telemetry
+
+        Returns
+        -------
+        dict
+            size (number of elements), capacity, load (size / capacity),
+            resize_count and bytes_copied
+        """
+        capacity = len(self.main_list)
+
+        return {
+            'size': self.num_elements,
+            'capacity': capacity,
+            'load': self.num_elements / capacity if capacity else 0.0,
+            'resize_count': self.resize_count,
+            'bytes_copied': self.bytes_copied,
+        }
 
     def to_list(self):
         """Returns object contents, in form of standard Python list.
@@ -83,34 +283,468 @@ class ArrayList():
         list
             Values in main_list, converted to a standard Python list object
         """
+        if self.typecode is not None:
+            return self.main_list[:self.num_elements].tolist()
+
         return self.main_list[:self.num_elements]
 
+    def to_memoryview(self):
+        """Returns a zero-copy view of the filled region of main_list. Only
+        available if typecode was set.
+
+        The view must be released (memoryview.release, or a with block)
+        before appending more elements, as main_list can't be resized while
+        it is exported.
+
+        Returns
+        -------
+        memoryview
+            View of first num_elements values in main_list, with format
+            typecode
+        """
+        if self.typecode is None:
+            raise TypeError('to_memoryview needs ArrayList with a typecode')
+
+        return memoryview(self.main_list)[:self.num_elements]
+
+    def __buffer__(self, flags):
+        """Implement the buffer protocol (Python 3.12+, PEP 688), exporting
+        the filled region of main_list without copying. Wraps this object's
+        to_memoryview method.
+        """
+        return self.to_memoryview()
+
     def __str__(self):
         """Overload __str__ to print a more useful output: the values in
-        main_list. Wraps this object's to_list method.
+        main_list, formatted like a standard Python list, without copying
+        them into one first.
 
         Returns
         -------
         str
-            Values in main_list, converted to a standard Python list object,
-            then whole list converted to a str
+            Values in main_list, in list notation
+        """
+        return _format_elements(self)
+
+    def __len__(self):
+        """Return number of elements stored (not length of main_list)
+        """
+        return self.num_elements
+
+    def _check_index(self, index):
+        """Return index as a non-negative index into main_list, raising an
+        IndexError if it is out of range. Negative indexes count from the end.
+        """
+        if index < 0:
+            index += self.num_elements
+
+        if not 0 <= index < self.num_elements:
+            raise IndexError('ArrayList index out of range')
+
+        return index
+
+    def __getitem__(self, index):
+        """Return element at index, or a view of a slice of elements.
+
+        Parameters
+        ----------
+        index : int or slice
+            Position of element (negative counts from end), or slice
+
+        Returns
+        -------
+        Element at index, or ArrayListView of slice (without copying)
+        """
+        if isinstance(index, slice):
+            return ArrayListView(
+                self, range(*index.indices(self.num_elements))
+            )
+
+        return self.main_list[self._check_index(index)]
+
+    def __setitem__(self, index, value):
+        """Replace element at index, or elements of a slice.
+
+        Parameters
+        ----------
+        index : int or slice
+            Position of element (negative counts from end), or slice
+        value
+            New element; for a slice, an iterable of as many elements as the
+            slice covers, as the number of elements can't change
+        """
+        if isinstance(index, slice):
+            ArrayListView(
+                self, range(*index.indices(self.num_elements))
+            )[:] = value
+            return
+
+        self.main_list[self._check_index(index)] = value
+
+    def __iter__(self):
+        """Overload __iter__ to allow object to become iterable; walks the
+        values in main_list in place, without copying them.
+
+        Raises a RuntimeError if the number of elements changes during
+        iteration.
+
+        Yields
+        ------
+        Each element, in order
+        """
+        main_list = self.main_list
+        modification_count = self.modification_count
+
+        for index in range(self.num_elements):
+            if self.modification_count != modification_count:
+                raise RuntimeError('ArrayList changed size during iteration')
+            yield main_list[index]
+
+
+class ArrayListView():
+    """Class to represent a slice of an ArrayList, without copying it.
+
+    Reads and writes go through to the underlying ArrayList. The view is
+    invalidated, raising a RuntimeError on any later use, once the number of
+    elements in the ArrayList changes.
+    """
+
+    def __init__(self, array_list, indexes):
+        """Initialise view
+
+        Parameters
+        ----------
+        array_list : ArrayList
+            List being viewed
+        indexes : range
+            Indexes in array_list covered by the view, in order
+        """
+        self.array_list = array_list
+        self.indexes = indexes
+        self.modification_count = array_list.modification_count
+
+    def _check_valid(self):
+        if self.array_list.modification_count != self.modification_count:
+            raise RuntimeError('ArrayList changed size since view was created')
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __getitem__(self, index):
+        """Return element at index in view, or a view of a slice of the view
         """
-        return str(self.to_list())
+        self._check_valid()
+
+        if isinstance(index, slice):
+            return ArrayListView(self.array_list, self.indexes[index])
+
+        return self.array_list.main_list[self.indexes[index]]
+
+    def __setitem__(self, index, value):
+        """Replace element at index in view, or elements of a slice of the
+        view with an iterable of as many elements
+        """
+        self._check_valid()
+
+        if not isinstance(index, slice):
+            self.array_list.main_list[self.indexes[index]] = value
+            return
+
+        indexes = self.indexes[index]
+        values = list(value)
+
+        if len(values) != len(indexes):
+            raise ValueError(
+                'Attempt to assign sequence of size {} to slice of size '
+                '{}'.format(len(values), len(indexes))
+            )
+
+        main_list = self.array_list.main_list
+        for list_index, element in zip(indexes, values):
+            main_list[list_index] = element
 
     def __iter__(self):
-        """Overload __iter__ to allow object to become iterable; allows
-        iterating over values in main_list.
+        """Walk elements of view in place, raising a RuntimeError if the
+        number of elements in the ArrayList changes during iteration
+        """
+        self._check_valid()
+
+        main_list = self.array_list.main_list
+
+        for index in self.indexes:
+            self._check_valid()
+            yield main_list[index]
+
+    def to_list(self):
+        """Returns elements of view, copied into a standard Python list
+        """
+        return list(self)
+
+    def __str__(self):
+        return _format_elements(self)
+
+
+class MappedArrayList():
+    """Class to represent an append-only array of fixed-width records,
+    stored in a file and accessed through a memory map, so it persists
+    between processes and can be larger than memory.
+
+    Records are packed with a struct format (e.g. '<qd' for an integer and a
+    float). Like ArrayList, the file is grown by resizing_factor when full,
+    so appends are amortised constant time.
+
+    The file header holds a committed length, only updated by flush (and
+    close) after the records themselves have been written out. So if the
+    process crashes, reopening the file gives every record up to the last
+    flush, and never a partially written one. Reopening only reads the
+    header, so is near instant for files of any size.
+    """
+
+    def __init__(self, path, record_format=None, initial_length=2,
+                 resizing_factor=2):
+        """Open file at path, creating it if it doesn't exist
+
+        Parameters
+        ----------
+        path : str
+            Path to file
+        record_format : str, optional
+            struct format of each record, of at most 32 ASCII characters;
+            may be omitted when opening an existing file, but must match it
+            if given
+        initial_length : int, optional
+            Starting capacity, in records, of a new file
+        resizing_factor : int or float, optional
+            Factor by which to multiply capacity when file needs resizing
+        """
+        if resizing_factor <= 1:
+            raise ValueError('resizing_factor must be greater than 1')
+
+        self.path = path
+        self.resizing_factor = resizing_factor
+        self.resize_count = 0
+
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if not exists and record_format is None:
+            raise ValueError('record_format needed to create a new file')
+        if (record_format is not None and
+                len(record_format.encode('ascii')) > _MAX_FORMAT_LENGTH):
+            raise ValueError(
+                'record_format must be at most {} characters'.format(
+                    _MAX_FORMAT_LENGTH
+                )
+            )
+
+        self.file = open(path, 'r+b' if exists else 'w+b')
+
+        if exists:
+            magic, record_size, capacity, length, stored_format = (
+                _MAPPED_HEADER.unpack(self.file.read(_MAPPED_HEADER.size))
+            )
+            if magic != _MAPPED_MAGIC:
+                self.file.close()
+                raise ValueError('{} is not a MappedArrayList'.format(path))
+
+            stored_format = stored_format.rstrip(b'\0').decode('ascii')
+            if record_format is None:
+                record_format = stored_format
+            elif record_format != stored_format:
+                self.file.close()
+                raise ValueError(
+                    'File has record format {!r}, not {!r}'.format(
+                        stored_format, record_format
+                    )
+                )
+
+            if record_size != struct.calcsize(record_format):
+                self.file.close()
+                raise ValueError(
+                    'File has {}-byte records, but format {!r} packs {} '
+                    'bytes'.format(
+                        record_size, record_format,
+                        struct.calcsize(record_format)
+                    )
+                )
+        else:
+            capacity = max(1, initial_length)
+            length = 0
+
+        self.record = struct.Struct(record_format)
+        self.record_format = record_format
+
+        # Records with a single field are stored and returned as plain values
+        self.single_field = len(self.record.unpack(
+            bytes(self.record.size)
+        )) == 1
+
+        self.capacity = capacity
+        self.num_elements = length
+
+        if not exists:
+            self.file.truncate(self._file_size(capacity))
+            self.file.write(_MAPPED_HEADER.pack(
+                _MAPPED_MAGIC, self.record.size, capacity, 0,
+                record_format.encode('ascii')
+            ))
+            self.file.flush()
+
+        self.mapped_file = mmap.mmap(self.file.fileno(), 0)
+
+    def _file_size(self, capacity):
+        """Return size in bytes of a file holding capacity records
+        """
+        return _MAPPED_HEADER.size + capacity * self.record.size
+
+    def _resize(self, capacity):
+        """Grow file to hold capacity records, and remap it
+        """
+        self.mapped_file.close()
+        self.file.truncate(self._file_size(capacity))
+        self.mapped_file = mmap.mmap(self.file.fileno(), 0)
+
+        self.capacity = capacity
+        self.resize_count += 1
+
+        # Capacity can be updated straight away, since the new records are
+        # zeros, beyond the committed length
+        _UINT64.pack_into(self.mapped_file, _CAPACITY_OFFSET, capacity)
+
+    def _expand(self, min_capacity):
+        """Grow capacity by resizing_factor, or to min_capacity if that is
+        larger, in one step
+        """
+        self._resize(max(
+            int(math.ceil(self.resizing_factor * self.capacity)),
+            self.capacity + 1,
+            min_capacity
+        ))
+
+    def _pack(self, index, record):
+        """Write record at index, which must be less than capacity
+        """
+        offset = _MAPPED_HEADER.size + index * self.record.size
+
+        if self.single_field:
+            self.record.pack_into(self.mapped_file, offset, record)
+        else:
+            self.record.pack_into(self.mapped_file, offset, *record)
+
+    def _unpack(self, index):
+        """Read record at index, which must be less than capacity
+        """
+        record = self.record.unpack_from(
+            self.mapped_file, _MAPPED_HEADER.size + index * self.record.size
+        )
+
+        if self.single_field:
+            return record[0]
+        return record
+
+    def append(self, record):
+        """Append record, growing file if necessary. Not persistent until
+        flush is called.
+
+        Parameters
+        ----------
+        record : tuple, or value for single field formats
+            Fields to pack with record_format
+        """
+        if self.num_elements == self.capacity:
+            self._expand(self.num_elements + 1)
+
+        self._pack(self.num_elements, record)
+        self.num_elements += 1
+
+    def extend(self, records):
+        """Append records, growing file at most once if records has a length
+
+        Parameters
+        ----------
+        records : iterable
+            Records to append
+        """
+        if hasattr(records, '__len__'):
+            end = self.num_elements + len(records)
+            if end > self.capacity:
+                self._expand(end)
+
+        for record in records:
+            self.append(record)
+
+    def flush(self):
+        """Write appended records to disk, then commit the new length to the
+        header, so the file is consistent if the process crashes later
+        """
+        self.mapped_file.flush()
+
+        _UINT64.pack_into(self.mapped_file, _LENGTH_OFFSET, self.num_elements)
+        # Header is in first page, which may be longer than the whole file
+        self.mapped_file.flush(0, min(mmap.PAGESIZE, len(self.mapped_file)))
+
+    def __len__(self):
+        return self.num_elements
+
+    def __getitem__(self, index):
+        """Return record at index, or list of records in a slice
+
+        Parameters
+        ----------
+        index : int or slice
+            Position of record (negative counts from end), or slice
 
         Returns
         -------
-        list_iterator
-            Iterator object over values in main_list
+        Record, or list of records
+        """
+        if isinstance(index, slice):
+            return [
+                self._unpack(i)
+                for i in range(*index.indices(self.num_elements))
+            ]
+
+        if index < 0:
+            index += self.num_elements
+        if not 0 <= index < self.num_elements:
+            raise IndexError('MappedArrayList index out of range')
+
+        return self._unpack(index)
+
+    def __iter__(self):
+        for index in range(self.num_elements):
+            yield self._unpack(index)
+
+    def to_list(self):
+        """Returns all records, in a standard Python list
+        """
+        return self[:]
+
+    def __str__(self):
+        return _format_elements(self)
+
+    def close(self):
+        """Flush, then unmap and close underlying file
         """
-        return iter(self.to_list())
+        self.flush()
+        self.mapped_file.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _format_elements(elements):
+    """Format an iterable of elements like a standard Python list
+    """
+    return '[' + ', '.join(repr(element) for element in elements) + ']'
 
 
 if __name__ == '__main__':
 
+    import tempfile
+
     a = ArrayList()
 
     a.append(3)
@@ -122,3 +756,87 @@ if __name__ == '__main__':
 
     for item in a:
         print(item)
+
+    print(len(a), a[0], a[-1], a[1:4], a[::-2])
+    a[1:3] = [40, 50]
+    print(a)
+
+    try:
+        for item in a:
+            a.append(item)
+    except RuntimeError as error:
+        print(error)
+
+    # Typed mode: floats stored unboxed, readable without copying
+    t = ArrayList(typecode='d')
+    t.extend([0.5, 1.5, 2.5])
+
+    with t.to_memoryview() as view:
+        print(view.format, view.itemsize, view.tolist())
+        print(struct.unpack_from('<3d', view))
+
+    # Allocation telemetry: one large extend resizes once, where appending
+    # the same elements one at a time resizes repeatedly
+    for resizing_factor in (2, 1.5):
+        appended = ArrayList(resizing_factor=resizing_factor)
+        for i in range(10 ** 5):
+            appended.append(i)
+
+        extended = ArrayList(resizing_factor=resizing_factor)
+        extended.extend(range(10 ** 5))
+
+        print('resizing factor {}: append {}, extend {}'.format(
+            resizing_factor, appended.stats(), extended.stats()
+        ))
+
+    while len(appended) > 10:
+        appended.pop()
+    print('after popping:', appended.stats())
+    appended.shrink_to_fit()
+    print('after shrink_to_fit:', appended.stats())
+
+    # Persistent records: reopening only reads the header
+    path = os.path.join(tempfile.mkdtemp(), 'records.bin')
+
+    with MappedArrayList(path, '<qd') as records:
+        records.extend([(i, i / 2) for i in range(10 ** 5)])
+        records.append((-1, 0.0))
+
+    start = time.perf_counter()
+    records = MappedArrayList(path)
+    open_time = time.perf_counter() - start
+    print('reopened {} records in {:.6f}s: {} ... {}'.format(
+        len(records), open_time, records[:2], records[-1]
+    ))
+
+    # Simulate a crash: records appended but never flushed aren't committed
+    records.append((-2, 0.0))
+    records.mapped_file.close()
+    records.file.close()
+
+    with MappedArrayList(path) as records:
+        print('after simulated crash: {} records'.format(len(records)))
+
+    # Peak memory used by iteration, against the old approach of iterating
+    # over a copy from to_list, as the list grows
+    for num_elements in (10 ** 4, 10 ** 5, 10 ** 6):
+        a = ArrayList()
+        a.extend(range(num_elements))
+
+        for name, iterable in (('in place', lambda: a),
+                               ('to_list copy', lambda: iter(a.to_list()))):
+            tracemalloc.start()
+            for item in iterable():
+                pass
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            # Timed separately, as tracemalloc slows the generator down
+            start = time.perf_counter()
+            for item in iterable():
+                pass
+            iteration_time = time.perf_counter() - start
+
+            print('{} elements, {}: peak {} bytes, {:.3f}s'.format(
+                num_elements, name, peak_memory, iteration_time
+            ))
@@ -1,4 +1,57 @@
-def bubble_sort(array, ascending=True):
+import operator
+import random
+import time
+
+
+class _KeyedItem():
+    """Array element decorated with its sort key, so that key is computed
+    only once per element. Compared by key alone, so elements with equal
+    keys stay in their original order under a stable sort.
+    """
+
+    __slots__ = ('key', 'value')
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+    def __gt__(self, other):
+        return self.key > other.key
+
+
+def _prepare(array, key, inplace):
+    """Return list for a comparison sort to reorder: array itself if inplace,
+    otherwise a copy. If key given, always a new list of elements wrapped in
+    _KeyedItems, so that array is left untouched if key or a comparison
+    raises an error part way through the sort.
+    """
+    if key is None:
+        return array if inplace else array.copy()
+
+    return [_KeyedItem(key(item), item) for item in array]
+
+
+def _finish(sorted_array, array, key, inplace):
+    """Return sorted result of a comparison sort, given list it sorted and
+    input array: unwrapping elements wrapped by _prepare, and writing them
+    back into array if inplace
+    """
+    if key is None:
+        return sorted_array
+
+    if not inplace:
+        array = sorted_array
+
+    for i, item in enumerate(sorted_array):
+        array[i] = item.value
+
+    return array
+
+
+def bubble_sort(array, ascending=True, key=None, inplace=False):
     """Sort array using bubble sort algorithm.
 
     Parameters
@@ -8,14 +61,24 @@ def bubble_sort(array, ascending=True):
     ascending : bool, optional
         If True sort array from smallest to largest; False -> sort array from
         largest to smallest
+    key : func, optional
+        Function applied (once) to each element of array, to produce the
+        value it is sorted by
+    inplace : bool, optional
+        If True sort array itself, rather than a copy
 
     Returns
     -------
     list
-        Input array sorted.
+        Input array sorted (array itself, if inplace).
     """
-    # Create copy to avoid modifying array inplace
-    array = array.copy()
+    # Unless sorting inplace, create copy to avoid modifying array
+    input_array = array
+    array = _prepare(array, key, inplace)
+
+    # Comparison deciding whether first element must go before second, with
+    # equal elements never swapped, so that sort is stable in either order
+    precedes = operator.lt if ascending else operator.gt
 
     # Use swap_count to keep track of number of swaps on each sweep
     swap_count = 1
@@ -31,7 +94,7 @@ def bubble_sort(array, ascending=True):
         for i in range(len(array) - sweep_count - 1):
 
             # Swap pair of elements being compared if out of order
-            if array[i] > array[i+1]:
+            if precedes(array[i+1], array[i]):
                 # Perform swap
                 temp = array[i+1]
                 array[i+1] = array[i]
@@ -44,14 +107,10 @@ def bubble_sort(array, ascending=True):
         # correct order, at end of array
         sweep_count += 1
 
-    if ascending:
-        return array
-    else:
-        # Reverse array for descending order sort
-        return array[::-1]
+    return _finish(array, input_array, key, inplace)
 
 
-def selection_sort(array, ascending=True):
+def selection_sort(array, ascending=True, key=None, inplace=False):
     """Sort array using selection sort algorithm.
 
     Parameters
@@ -61,44 +120,48 @@ def selection_sort(array, ascending=True):
     ascending : bool, optional
         If True sort array from smallest to largest; False -> sort array from
         largest to smallest
+    key : func, optional
+        Function applied (once) to each element of array, to produce the
+        value it is sorted by
+    inplace : bool, optional
+        If True sort array itself, rather than a copy
 
     Returns
     -------
     list
-        Input array sorted.
+        Input array sorted (array itself, if inplace).
     """
-    # Create copy to avoid modifying array inplace
-    array = array.copy()
+    # Unless sorting inplace, create copy to avoid modifying array
+    input_array = array
+    array = _prepare(array, key, inplace)
+
+    # Comparison deciding whether first element must go before second
+    precedes = operator.lt if ascending else operator.gt
 
     # Iterate through all but last element in array
     for i in range(len(array)-1):
 
-        # Find index of min value element out of array, starting after current
-        # element
-        # Initialise min val to last element in (sub-)array
-        min_val = array[i+1:][-1]
-        min_index = len(array[i+1:]) - 1
-        for index, val in enumerate(array[i+1:]):
-            if val < min_val:
-                min_val = val
+        # Find index of first element to go next (min value for ascending
+        # order, max for descending) out of array, starting after current
+        # element. Indexed directly, rather than slicing array, to avoid
+        # copying the rest of array on every iteration
+        min_index = i + 1
+        min_val = array[min_index]
+        for index in range(i + 2, len(array)):
+            if precedes(array[index], min_val):
+                min_val = array[index]
                 min_index = index
-        # Convert to index in array (not sliced)
-        min_index = i + 1 + min_index
 
-        # Swap current element with min element, if min element is smaller
-        if array[i] > min_val:
+        # Swap current element with min element, if min element goes first
+        if precedes(min_val, array[i]):
             # Perform swap
             array[min_index] = array[i]
             array[i] = min_val
 
-    if ascending:
-        return array
-    else:
-        # Reverse array for descending order sort
-        return array[::-1]
+    return _finish(array, input_array, key, inplace)
 
 
-def merge_sort(array, ascending=True):
+def merge_sort(array, ascending=True, key=None, inplace=False):
     """Sort array using merge sort algorithm.
 
     Parameters
@@ -108,11 +171,16 @@ def merge_sort(array, ascending=True):
     ascending : bool, optional
         If True sort array from smallest to largest; False -> sort array from
         largest to smallest
+    key : func, optional
+        Function applied (once) to each element of array, to produce the
+        value it is sorted by
+    inplace : bool, optional
+        If True sort array itself, rather than a copy
 
     Returns
     -------
     list
-        Input array sorted.
+        Input array sorted (array itself, if inplace).
     """
 
     def recursive_merge_sort(array, helper_arr, low, high):
@@ -192,15 +260,15 @@ def merge_sort(array, ascending=True):
             # placed into array, keeping track using helper_left and
             # helper_right pointers, placing smaller of two in the array. Bear
             # in mind that both sub-arrays
-            # are sorted.
-            if helper_arr[helper_left] <= helper_arr[helper_right]:
-                # i.e. element in left sub-array is smaller
-                array[current] = helper_arr[helper_left]
-                helper_left += 1
-            else:
-                # i.e. element in right sub-array is smaller
+            # are sorted. Ties go to left sub-array, keeping sort stable.
+            if precedes(helper_arr[helper_right], helper_arr[helper_left]):
+                # i.e. element in right sub-array goes first
                 array[current] = helper_arr[helper_right]
                 helper_right += 1
+            else:
+                # i.e. element in left sub-array goes first (or tie)
+                array[current] = helper_arr[helper_left]
+                helper_left += 1
 
             # Iterate pointer to position in array
             current += 1
@@ -216,8 +284,12 @@ def merge_sort(array, ascending=True):
 
         return array
 
-    # Create copy to avoid modifying array inplace
-    array = array.copy()
+    # Unless sorting inplace, create copy to avoid modifying array
+    input_array = array
+    array = _prepare(array, key, inplace)
+
+    # Comparison deciding whether first element must go before second
+    precedes = operator.lt if ascending else operator.gt
 
     # Initialise helper array, used to store elements of two arrays being
     # merged, while they are being inserted (in order) into main array
@@ -226,15 +298,20 @@ def merge_sort(array, ascending=True):
     # Perform merge sort recursively
     array = recursive_merge_sort(array, helper_arr, 0, len(array) - 1)
 
-    if ascending:
-        return array
-    else:
-        # Reverse array for descending order sort
-        return array[::-1]
+    return _finish(array, input_array, key, inplace)
 
 
-def quick_sort(array, ascending=True):
-    """Sort array using quick sort algorithm.
+def quick_sort(array, ascending=True, key=None, inplace=False):
+    """Sort array using quick sort algorithm, in its introsort form.
+
+    Pivots are the median of three elements (or, for large sub-arrays, the
+    median of three such medians), and each sub-array is split three ways,
+    into elements smaller than, equal to and larger than the pivot, so runs
+    of duplicates are never sorted again. Sub-arrays are kept on an explicit
+    stack rather than sorted recursively, and short ones are finished off by
+    insertion sort. If partitioning goes more than 2 * log2(n) levels deep
+    (e.g. on adversarial input), the sub-array is heap sorted instead, so the
+    worst case is O(n log n) rather than O(n^2).
 
     Parameters
     ----------
@@ -243,117 +320,181 @@ def quick_sort(array, ascending=True):
     ascending : bool, optional
         If True sort array from smallest to largest; False -> sort array from
         largest to smallest
+    key : func, optional
+        Function applied (once) to each element of array, to produce the
+        value it is sorted by
+    inplace : bool, optional
+        If True sort array itself, rather than a copy
 
     Returns
     -------
     list
-        Input array sorted.
+        Input array sorted (array itself, if inplace).
     """
+    # Sub-arrays with at most this many elements are insertion sorted
+    insertion_sort_cutoff = 16
+    # Sub-arrays with more than this many elements use ninther pivots
+    ninther_cutoff = 40
 
-    def recursive_quick_sort(array, left_index, right_index):
-        """Recursively quick sort array, with sub-array to sort specified by
-        starting (left) and ending (right) indices.
-
-        Parameters
-        ----------
-        array : list
-            Array to sort. Can be any comparable Python data type.
-        left_index : int
-            Index in array where sub-array starts
-        right_index : int
-            Index in array where sub-array ends
-
-        Returns
-        -------
-        array : list
-            Input (sub-) array sorted
+    def insertion_sort(array, low, high):
+        """Insertion sort sub-array between low and high indices (inclusive)
+        """
+        for i in range(low + 1, high + 1):
+            val = array[i]
+            j = i - 1
+            # Shift elements that go after val one place right, to make room
+            # for it
+            while j >= low and precedes(val, array[j]):
+                array[j + 1] = array[j]
+                j -= 1
+            array[j + 1] = val
+
+    def heap_sort(array, low, high):
+        """Heap sort sub-array between low and high indices (inclusive)
         """
 
-        # Partition sub-array
-        array, index = partition(array, left_index, right_index)
-
-        # Recursively quick sort left half of sub-array (to left of partition
-        # element), provided that left_index pointer moves forward by at least
-        # 2 places in partition function (i.e. needs sorting, more than 2
-        # elements)
-        # Stopping case for recursion
-        if left_index < index - 1:
-            array = recursive_quick_sort(array, left_index, index - 1)
-
-        # Similar for right half
-        # Stopping case for recursion
-        if index < right_index:
-            array = recursive_quick_sort(array, index, right_index)
-
-        return array
-
-    def partition(array, left_index, right_index):
-        """Partition sub-array down middle, ensuring that all elements to left
-        of partition element are smaller than it, and all elements to right
-        are larger. Sub-array defined between left_index and right_index
-        pointers.
+        def sift_down(root, end):
+            """Move element at root (an index relative to low) down the heap
+            stored in array[low: low + end], until neither of its children
+            goes after it (a max heap, in ascending order)
+            """
+            val = array[low + root]
+            child = 2 * root + 1
+            while child < end:
+                # Pick child that goes last (larger, in ascending order)
+                if child + 1 < end and precedes(
+                        array[low + child], array[low + child + 1]):
+                    child += 1
+                if not precedes(val, array[low + child]):
+                    break
+                array[low + root] = array[low + child]
+                root = child
+                child = 2 * root + 1
+            array[low + root] = val
+
+        length = high - low + 1
+
+        # Arrange sub-array into heap
+        for root in range(length // 2 - 1, -1, -1):
+            sift_down(root, length)
+
+        # Repeatedly swap remaining element that goes last to end of heap
+        for end in range(length - 1, 0, -1):
+            array[low], array[low + end] = array[low + end], array[low]
+            sift_down(0, end)
+
+    def median_of_three(a, b, c):
+        """Return median of three values
+        """
+        if precedes(a, b):
+            if precedes(b, c):
+                return b
+            return c if precedes(a, c) else a
+        if precedes(a, c):
+            return a
+        return c if precedes(b, c) else b
+
+    def choose_pivot(array, low, high):
+        """Return pivot value for sub-array: median of first, middle and last
+        elements, or for large sub-arrays median of medians of three evenly
+        spaced triples (Tukey's ninther)
+        """
+        mid = (low + high) // 2
+
+        if high - low + 1 <= ninther_cutoff:
+            return median_of_three(array[low], array[mid], array[high])
+
+        step = (high - low + 1) // 8
+        return median_of_three(
+            median_of_three(
+                array[low], array[low + step], array[low + 2 * step]
+            ),
+            median_of_three(
+                array[mid - step], array[mid], array[mid + step]
+            ),
+            median_of_three(
+                array[high - 2 * step], array[high - step], array[high]
+            )
+        )
 
-        Parameters
-        ----------
-        array : list
-            Array to sort. Can be any comparable Python data type.
-        left_index : int
-            Index in array where sub-array starts
-        right_index : int
-            Index in array where sub-array ends
+    def partition(array, low, high):
+        """Partition sub-array between low and high indices three ways (Dutch
+        national flag partitioning): elements smaller than the pivot, then
+        elements equal to it, then larger elements.
 
         Returns
         -------
-        array : list
-            Input (sub-) array partitioned
-        left_index : int
-            Result value of left_index after performing partitioning
+        less_end : int
+            Index of first element equal to pivot
+        greater_start : int
+            Index of first element larger than pivot
         """
-        # Choose pivot point (halfway through sub-array)
-        pivot_index = int((left_index + right_index) / 2.0)
-        pivot_val = array[pivot_index]
+        pivot_val = choose_pivot(array, low, high)
 
-        # Keep going through sub-array until left_index and right_index
-        # pointers reach each other
-        while left_index <= right_index:
+        # array[low: less_end] < pivot, array[less_end: current] == pivot,
+        # array[greater_start: high + 1] > pivot, and elements from current
+        # up to greater_start still to be checked
+        less_end = low
+        current = low
+        greater_start = high + 1
+
+        while current < greater_start:
+            val = array[current]
+            if precedes(val, pivot_val):
+                array[current] = array[less_end]
+                array[less_end] = val
+                less_end += 1
+                current += 1
+            elif precedes(pivot_val, val):
+                greater_start -= 1
+                array[current] = array[greater_start]
+                array[greater_start] = val
+            else:
+                current += 1
 
-            # Find leftmost element on the left of the partition that should be
-            # on right side
-            while array[left_index] < pivot_val:
-                left_index += 1
+        return less_end, greater_start
 
-            # Find rightmost element on the right of the partition that should
-            # be on left side
-            while array[right_index] > pivot_val:
-                right_index -= 1
+    # Unless sorting inplace, create copy to avoid modifying array
+    input_array = array
+    array = _prepare(array, key, inplace)
 
-            # Swap elements on left and right sides that are out of place
-            if left_index <= right_index:
-                # Perform swap
-                temp = array[right_index]
-                array[right_index] = array[left_index]
-                array[left_index] = temp
+    # Comparison deciding whether first element must go before second, so
+    # descending sorts need no reversing afterwards
+    precedes = operator.lt if ascending else operator.gt
 
-                # Iterate left_index and right_index pointers
-                left_index += 1
-                right_index -= 1
+    # Stack of (low, high, depth_limit) sub-arrays still to sort, where
+    # depth_limit is number of partitioning levels left before falling back
+    # to heap sort
+    stack = [(0, len(array) - 1, 2 * max(len(array), 1).bit_length())]
 
-        return array, left_index
+    while stack:
+        low, high, depth_limit = stack.pop()
 
-    # Create copy to avoid modifying array inplace
-    array = array.copy()
+        while high - low + 1 > insertion_sort_cutoff:
+            if depth_limit == 0:
+                heap_sort(array, low, high)
+                break
+            depth_limit -= 1
 
-    # Perform quick sort recursively
-    array = recursive_quick_sort(array, 0, len(array) - 1)
+            less_end, greater_start = partition(array, low, high)
 
-    if ascending:
-        return array
-    else:
-        # Reverse array for descending order sort
-        return array[::-1]
+            # Push larger side onto stack and carry on with smaller side, so
+            # stack never holds more than log2(n) sub-arrays
+            if less_end - low < high - greater_start + 1:
+                stack.append((greater_start, high, depth_limit))
+                high = less_end - 1
+            else:
+                stack.append((low, less_end - 1, depth_limit))
+                low = greater_start
+        else:
+            # Only reached once sub-array is short, not after heap sort
+            insertion_sort(array, low, high)
+
+    return _finish(array, input_array, key, inplace)
 
 
-def counting_sort(array, k, key_func=lambda x: x, ascending=True):
+def counting_sort(array, k, key_func=lambda x: x, ascending=True,
+                  inplace=False):
     """Sort array using counting sort algorithm.
 
     Parameters
@@ -364,51 +505,58 @@ def counting_sort(array, k, key_func=lambda x: x, ascending=True):
     k : int
         Max value of key_func(i), -1, where i an element of array
     key_func : func, optional
-        Function to apply to elements of array to produce an integer in range 0
-        to k-1
+        Function to apply (once) to elements of array to produce an integer in
+        range 0 to k-1; the sort key
     ascending : bool, optional
         If True sort array from smallest to largest; False -> sort array from
         largest to smallest
+    inplace : bool, optional
+        If True write sorted elements back into array, rather than returning
+        a new list
 
     Returns
     -------
     output_arr : list
-        Input array sorted.
+        Input array sorted (array itself, if inplace).
     """
-    # Create copy to avoid modifying array inplace
-    array = array.copy()
+    # Compute each element's key once, as key_func may be expensive. array
+    # itself is only read, so no copy is needed
+    keys = [key_func(item) for item in array]
 
     # Generate array to contain counts of each distinct value in array
     counts = [0] * k
 
     # Populate counts array by running through array
-    for item in array:
-        counts[key_func(item)] += 1
+    for item_key in keys:
+        counts[item_key] += 1
 
     # Calculate starting index for each k value, putting them in counts
     # Effectively storing number of items with key_func(item) less than i
+    # (or greater than i, for descending order, so that items are placed in
+    # descending order directly, keeping equal items in their original order)
     total = 0
-    for i in range(k):
+    for i in (range(k) if ascending else range(k - 1, -1, -1)):
         old_count = counts[i]
         counts[i] = total
         total += old_count
 
     # Transfer to output array
     output_arr = [None] * len(array)
-    for item in array:
+    for item, item_key in zip(array, keys):
         # Store item in correct position in array
-        output_arr[counts[key_func(item)]] = item
+        output_arr[counts[item_key]] = item
         # Increment index for relevant k value
-        counts[key_func(item)] += 1
+        counts[item_key] += 1
+
+    if inplace:
+        array[:] = output_arr
+        return array
 
-    if ascending:
-        return output_arr
-    else:
-        # Reverse array for descending order sort
-        return output_arr[::-1]
+    return output_arr
 
 
-def radix_sort(array, base=10, ascending=True, validate_dtype=False):
+def radix_sort(array, base=10, ascending=True, validate_dtype=False,
+               key=None, inplace=False):
         """Sort array of integers using radix sort algorithm.
 
         Parameters
@@ -421,11 +569,19 @@ def radix_sort(array, base=10, ascending=True, validate_dtype=False):
         ascending : bool, optional
             If True sort array from smallest to largest; False -> sort array
             from largest to smallest
+        validate_dtype : bool, optional
+            If True raise an error if any element (or key) is not an int
+        key : func, optional
+            Function applied (once) to each element of array, to produce the
+            non-negative int it is sorted by; array may then hold any values
+        inplace : bool, optional
+            If True write sorted elements back into array, rather than
+            returning a new list
 
         Returns
         -------
         array : list
-            Input array sorted.
+            Input array sorted (array itself, if inplace).
         """
 
         def ensure_arr_of_ints(array):
@@ -444,31 +600,118 @@ def radix_sort(array, base=10, ascending=True, validate_dtype=False):
                         ).replace('  ', '')
                     )
 
-        # Create copy to avoid modifying array inplace
-        array = array.copy()
+        # Each counting sort pass below builds a new list, so array is only
+        # read, and no copy is needed. With key, sort (key, element) pairs,
+        # so that key is computed once per element
+        if key is None:
+            items = array
+        else:
+            items = [(key(item), item) for item in array]
+
+        def sort_keys():
+            """Return iterable of the ints array is sorted by
+            """
+            if key is None:
+                return items
+            return (item_key for item_key, item in items)
 
         if validate_dtype:
-            ensure_arr_of_ints(array)
+            ensure_arr_of_ints(sort_keys())
 
         iteration_count = 0
-        max_val = max(array)
+        max_val = max(sort_keys(), default=0)
         # Keep iterating until all digits have been used in the sort
         while max_val >= base**iteration_count:
 
             # Define function to extract correct digit from element in array
-            def key_func(x): return int((x / base**iteration_count) % base)
+            divisor = base**iteration_count
+            if key is None:
+                def key_func(x): return x // divisor % base
+            else:
+                def key_func(x): return x[0] // divisor % base
 
             # Sort array using counting sort, where keys are iteration_count
-            # digits from least significant digit of number
-            array = counting_sort(array, base, key_func=key_func)
+            # digits from least significant digit of number. Each pass is
+            # stable in either direction, so sorting every digit in
+            # descending order sorts numbers in descending order
+            items = counting_sort(
+                items, base, key_func=key_func, ascending=ascending
+            )
 
             iteration_count += 1
 
-        if ascending:
+        if key is not None:
+            items = [item for item_key, item in items]
+
+        if inplace:
+            array[:] = items
             return array
-        else:
-            # Reverse array for descending order sort
-            return array[::-1]
+
+        # Return a new list even if array needed no sorting passes
+        return items if items is not array else array.copy()
+
+
+def _baseline_quick_sort(array, max_work=None):
+    """Sort a copy of array ascending with the original quick sort: a middle
+    pivot and two pointer partitioning, with no fallback for bad inputs.
+    Kept as a benchmark baseline for quick_sort.
+
+    Recurses only into the smaller side of each partition, looping on the
+    larger, so recursion depth stays below log2(len(array)) however
+    unbalanced the partitions.
+
+    Parameters
+    ----------
+    array : list
+        List to be sorted
+    max_work : int, optional
+        Give up, raising RuntimeError, once partitioning has scanned this
+        many elements in total (quadratic inputs would take hours)
+
+    Returns
+    -------
+    list
+        Input array sorted
+    """
+    array = array.copy()
+    work = 0
+
+    def partition(left_index, right_index):
+        nonlocal work
+        work += right_index - left_index + 1
+        if max_work is not None and work > max_work:
+            raise RuntimeError('quick sort baseline exceeded max_work')
+
+        pivot_val = array[(left_index + right_index) // 2]
+
+        while left_index <= right_index:
+            while array[left_index] < pivot_val:
+                left_index += 1
+            while array[right_index] > pivot_val:
+                right_index -= 1
+            if left_index <= right_index:
+                array[left_index], array[right_index] = (
+                    array[right_index], array[left_index]
+                )
+                left_index += 1
+                right_index -= 1
+
+        return left_index
+
+    def recursive_quick_sort(left_index, right_index):
+        while left_index < right_index:
+            index = partition(left_index, right_index)
+
+            # Sub-arrays are [left_index, index - 1] and [index, right_index]
+            if index - left_index < right_index - index:
+                recursive_quick_sort(left_index, index - 1)
+                left_index = index
+            else:
+                recursive_quick_sort(index, right_index)
+                right_index = index - 1
+
+    recursive_quick_sort(0, len(array) - 1)
+    return array
 
 
 if __name__ == '__main__':
@@ -535,3 +778,56 @@ if __name__ == '__main__':
         'arr sorted using radix sort (descending order):',
         radix_sort(arr, ascending=False)
     )
+
+    # Sorting by key (computed once per element), stable in descending order
+    people = [('Ann', 31), ('Bob', 25), ('Cat', 31), ('Dan', 25)]
+    print(
+        'people sorted by age using merge sort (descending order):',
+        merge_sort(people, ascending=False, key=lambda person: person[1])
+    )
+
+    # Sorting inplace, without copying array
+    quick_sort(arr, inplace=True)
+    print('arr after quick sort inplace:', arr)
+
+    # Quick sort on input shapes that defeat a fixed middle pivot (organ
+    # pipe) or naive partitioning (duplicates), against the original quick
+    # sort and Python's sorted
+    num_elements = 10 ** 5
+    inputs = {
+        'random': [random.random() for i in range(num_elements)],
+        'sorted': list(range(num_elements)),
+        'reversed': list(range(num_elements, 0, -1)),
+        'few distinct': [random.randrange(10) for i in range(num_elements)],
+        'organ pipe': (
+            list(range(num_elements // 2)) +
+            list(range(num_elements // 2, 0, -1))
+        ),
+    }
+
+    # Allow the baseline 50 times the partitioning work of n log2 n
+    max_work = 50 * num_elements * num_elements.bit_length()
+
+    for name, array in inputs.items():
+        start = time.perf_counter()
+        result = quick_sort(array)
+        quick_sort_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            assert _baseline_quick_sort(array, max_work) == result
+        except RuntimeError:
+            baseline = 'gave up after {:.3f}s (quadratic)'.format(
+                time.perf_counter() - start
+            )
+        else:
+            baseline = '{:.3f}s'.format(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        assert result == sorted(array)
+        sorted_time = time.perf_counter() - start
+
+        print('{}: quick sort {:.3f}s, original quick sort {}, '
+              'sorted {:.3f}s'.format(
+                  name, quick_sort_time, baseline, sorted_time
+              ))
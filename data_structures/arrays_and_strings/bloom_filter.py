@@ -0,0 +1,204 @@
+import math
+import time
+
+
+_MASK_64 = (1 << 64) - 1
+
+
+def _mix64(value):
+    """Scramble a 64-bit integer with the SplitMix64 finaliser, so that
+    similar inputs (e.g. consecutive ints, whose Python hash is themselves)
+    give unrelated outputs
+
+    Parameters
+    ----------
+    value : int
+        Integer to scramble; only its lowest 64 bits are used
+
+    Returns
+    -------
+    int
+        Unsigned 64-bit integer
+    """
+    value = (value + 0x9E3779B97F4A7C15) & _MASK_64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK_64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK_64
+    return value ^ (value >> 31)
+
+
+class BloomFilter():
+    """Class to represent a Bloom filter: a compact, probabilistic set.
+
+    contains(key) is False only if key was definitely never added; if True,
+    key was probably added, with the chance of it being wrong (a false
+    positive) staying close to false_positive_rate until more than capacity
+    keys have been added. Keys cannot be removed.
+
+    Stores num_bits bits in a bytearray. Each key sets num_hashes of them,
+    chosen by double hashing (bit i is h1 + i * h2, mod num_bits), so only
+    one hash of the key is needed.
+    """
+
+    def __init__(self, capacity, false_positive_rate=0.01, hash_function=hash):
+        """Initialise empty Bloom filter, sized for capacity keys
+
+        Parameters
+        ----------
+        capacity : int
+            Number of keys that can be added before the false positive rate
+            exceeds false_positive_rate
+        false_positive_rate : float, optional
+            Target probability of contains returning True for a key that was
+            never added
+        hash_function : function, optional
+            Maps a key to an integer
+        """
+        capacity = max(1, capacity)
+
+        # Optimal number of bits and hashes for capacity and target rate
+        self.num_bits = max(8, int(math.ceil(
+            -capacity * math.log(false_positive_rate) / math.log(2) ** 2
+        )))
+        self.num_hashes = max(1, int(round(
+            self.num_bits / capacity * math.log(2)
+        )))
+
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.hash_function = hash_function
+
+        # Number of calls to add
+        self.num_added = 0
+
+    def _double_hash(self, key):
+        """Return the two hashes that determine which bits key sets: bit i is
+        (h1 + i * h2) % num_bits
+
+        Parameters
+        ----------
+        key
+            Any key accepted by hash_function
+
+        Returns
+        -------
+        h1 : int
+            Starting bit
+        h2 : int
+            Step between bits; odd, so never 0
+        """
+        mixed = _mix64(self.hash_function(key))
+
+        # Split one 64-bit hash into two
+        return mixed & 0xFFFFFFFF, (mixed >> 32) | 1
+
+    def add(self, key):
+        """Add key to Bloom filter
+
+        Parameters
+        ----------
+        key
+            Any key accepted by hash_function
+        """
+        h1, h2 = self._double_hash(key)
+        bits = self.bits
+        num_bits = self.num_bits
+
+        for i in range(self.num_hashes):
+            position = (h1 + i * h2) % num_bits
+            bits[position >> 3] |= 1 << (position & 7)
+
+        self.num_added += 1
+
+    def contains(self, key):
+        """Return False if key was definitely never added, True if it probably
+        was
+
+        Parameters
+        ----------
+        key
+            Any key accepted by hash_function
+
+        Returns
+        -------
+        bool
+            Whether key may have been added
+        """
+        h1, h2 = self._double_hash(key)
+        bits = self.bits
+        num_bits = self.num_bits
+
+        # Stop at first unset bit; most keys never added stop after one or
+        # two bits
+        for i in range(self.num_hashes):
+            position = (h1 + i * h2) % num_bits
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+
+        return True
+
+    def estimated_false_positive_rate(self):
+        """Return expected false positive rate, given the number of keys added
+        so far
+
+        Returns
+        -------
+        float
+            Probability of contains returning True for a key never added
+        """
+        fraction_unset = math.exp(
+            -self.num_hashes * self.num_added / self.num_bits
+        )
+        return (1 - fraction_unset) ** self.num_hashes
+
+
+if __name__ == '__main__':
+
+    # Imported here, since hash_table imports this module
+    from data_structures.arrays_and_strings.hash_table import HashTable
+
+    b = BloomFilter(1000, false_positive_rate=0.01)
+    for i in range(1000):
+        b.add('key{}'.format(i))
+
+    false_positives = sum(
+        b.contains('missing{}'.format(i)) for i in range(100000)
+    )
+    print('bits: {}, hashes: {}, measured false positive rate: {:.4f}'.format(
+        b.num_bits, b.num_hashes, false_positives / 100000
+    ))
+
+    # Miss-heavy workload: 90% of lookups are for keys not in the table. The
+    # filter needs max_load_factor above 1; the larger it is, the longer the
+    # linked lists it saves walking
+    num_keys = 100000
+    keys = ['key{}'.format(i) for i in range(num_keys)]
+    lookups = [
+        'key{}'.format(i) if i % 10 == 0 else 'missing{}'.format(i)
+        for i in range(num_keys)
+    ]
+
+    for max_load_factor in (4, 16):
+        for bloom_rate in (None, 0.01):
+            table = HashTable(
+                8, max_load_factor=max_load_factor,
+                bloom_false_positive_rate=bloom_rate
+            )
+            table.insert_many((key, i) for i, key in enumerate(keys))
+
+            start = time.perf_counter()
+            for key in lookups:
+                table.contains(key)
+            loop_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            table.contains_many(lookups)
+            batch_time = time.perf_counter() - start
+
+            print(
+                'max_load_factor {}, bloom filter {}: contains {:.3f}s, '
+                'contains_many {:.3f}s for {} lookups'.format(
+                    max_load_factor, 'off' if bloom_rate is None else 'on',
+                    loop_time, batch_time, num_keys
+                )
+            )
@@ -0,0 +1,515 @@
+import functools
+import sys
+import time
+
+from data_structures.arrays_and_strings.hash_table import HashTable
+
+
+class CacheEntry():
+    """Class to represent a key, value pair stored in a Cache.
+
+    Doubles as a node in an intrusive doubly linked list (prev_entry and
+    next_entry), so an eviction policy can move or unlink an entry in
+    constant time, without searching for it.
+    """
+
+    def __init__(self, key, value, num_bytes, expires_at=None):
+        """Store key, value pair and its bookkeeping data
+
+        Parameters
+        ----------
+        key
+            Key in cache. Can be any non-mutable data type
+        value
+            Can be any python object
+        num_bytes : int
+            Size of value, counted against the cache's max_bytes
+        expires_at : float, optional
+            Clock time after which entry is stale; None for no expiry
+        """
+        self.key = key
+        self.value = value
+        self.num_bytes = num_bytes
+        self.expires_at = expires_at
+
+        # Number of times entry has been accessed (used by LFUPolicy)
+        self.frequency = 1
+
+        self.prev_entry = None
+        self.next_entry = None
+
+
+class EntryList():
+    """Class to represent a doubly linked list of CacheEntry objects, most
+    recently added at the front.
+
+    Uses a sentinel entry that links to both ends, so adding and unlinking
+    entries never needs to special-case an empty list.
+    """
+
+    def __init__(self):
+        """Initialise empty list, consisting only of sentinel entry
+        """
+        self.sentinel = CacheEntry(None, None, 0)
+        self.sentinel.prev_entry = self.sentinel
+        self.sentinel.next_entry = self.sentinel
+        self.length = 0
+
+    def push_front(self, entry):
+        """Add entry to front of list
+
+        Parameters
+        ----------
+        entry : CacheEntry
+            Entry not currently in any list
+        """
+        entry.prev_entry = self.sentinel
+        entry.next_entry = self.sentinel.next_entry
+        self.sentinel.next_entry.prev_entry = entry
+        self.sentinel.next_entry = entry
+        self.length += 1
+
+    def unlink(self, entry):
+        """Remove entry from list
+
+        Parameters
+        ----------
+        entry : CacheEntry
+            Entry currently in this list
+        """
+        entry.prev_entry.next_entry = entry.next_entry
+        entry.next_entry.prev_entry = entry.prev_entry
+        entry.prev_entry = None
+        entry.next_entry = None
+        self.length -= 1
+
+    def back(self):
+        """Return entry at back of list (least recently added), or None if
+        list is empty
+        """
+        if self.length == 0:
+            return None
+        return self.sentinel.prev_entry
+
+
+class LRUPolicy():
+    """Eviction policy that evicts the least recently used entry.
+
+    Eviction policies are notified when an entry is added, accessed and
+    removed, and choose the next entry to evict. Each step is constant time.
+    """
+
+    def __init__(self):
+        self.entries = EntryList()
+
+    def on_insert(self, entry):
+        self.entries.push_front(entry)
+
+    def on_access(self, entry):
+        # Move entry to front of recency list
+        self.entries.unlink(entry)
+        self.entries.push_front(entry)
+
+    def on_remove(self, entry):
+        self.entries.unlink(entry)
+
+    def victim(self):
+        """Return entry to evict next, or None if there are no entries
+        """
+        return self.entries.back()
+
+
+class FIFOPolicy(LRUPolicy):
+    """Eviction policy that evicts the entry that was inserted first,
+    regardless of how it has been accessed since.
+    """
+
+    def on_access(self, entry):
+        pass
+
+
+class FrequencyBucket():
+    """Class to represent the entries of an LFUPolicy with one access
+    frequency, as a node in a doubly linked list of buckets ordered by
+    frequency.
+    """
+
+    def __init__(self, frequency):
+        self.frequency = frequency
+        self.entries = EntryList()
+
+        self.prev_bucket = None
+        self.next_bucket = None
+
+
+class LFUPolicy():
+    """Eviction policy that evicts the least frequently used entry, breaking
+    ties by evicting the least recently used.
+
+    Keeps one FrequencyBucket per access frequency in use, linked in order of
+    frequency behind a sentinel bucket, so the lowest frequency is always
+    the first bucket and an accessed entry moves at most one bucket along:
+    every step is constant time.
+    """
+
+    def __init__(self):
+        # Maps access frequency to its FrequencyBucket
+        self.buckets = HashTable(8)
+
+        self.sentinel = FrequencyBucket(0)
+        self.sentinel.prev_bucket = self.sentinel
+        self.sentinel.next_bucket = self.sentinel
+
+    def _add_bucket(self, frequency, prev_bucket):
+        """Create bucket for frequency and link it after prev_bucket
+
+        Returns
+        -------
+        FrequencyBucket
+            New, empty bucket
+        """
+        bucket = FrequencyBucket(frequency)
+        bucket.prev_bucket = prev_bucket
+        bucket.next_bucket = prev_bucket.next_bucket
+        prev_bucket.next_bucket.prev_bucket = bucket
+        prev_bucket.next_bucket = bucket
+        self.buckets.insert(frequency, bucket)
+        return bucket
+
+    def _unlink(self, entry, bucket):
+        """Remove entry from its bucket, dropping the bucket if it becomes
+        empty
+        """
+        bucket.entries.unlink(entry)
+
+        if bucket.entries.length == 0:
+            bucket.prev_bucket.next_bucket = bucket.next_bucket
+            bucket.next_bucket.prev_bucket = bucket.prev_bucket
+            self.buckets.delete(bucket.frequency)
+
+    def on_insert(self, entry):
+        entry.frequency = 1
+
+        bucket = self.sentinel.next_bucket
+        if bucket.frequency != 1:
+            bucket = self._add_bucket(1, self.sentinel)
+        bucket.entries.push_front(entry)
+
+    def on_access(self, entry):
+        bucket = self.buckets.retrieve(entry.frequency)
+
+        # Next frequency's bucket, if in use, is the neighbouring one
+        next_bucket = bucket.next_bucket
+        if next_bucket.frequency != entry.frequency + 1:
+            next_bucket = self._add_bucket(entry.frequency + 1, bucket)
+
+        self._unlink(entry, bucket)
+        entry.frequency += 1
+        next_bucket.entries.push_front(entry)
+
+    def on_remove(self, entry):
+        self._unlink(entry, self.buckets.retrieve(entry.frequency))
+
+    def victim(self):
+        """Return entry to evict next, or None if there are no entries
+        """
+        return self.sentinel.next_bucket.entries.back()
+
+
+# Eviction policies that can be selected by name
+POLICIES = {
+    'lru': LRUPolicy,
+    'lfu': LFUPolicy,
+    'fifo': FIFOPolicy,
+}
+
+
+class Cache():
+    """Class to represent a bounded key, value cache.
+
+    Entries are stored in a HashTable, for constant time lookups, and tracked
+    by an eviction policy (LRU, LFU or FIFO), which chooses which entry to
+    evict when max_entries or max_bytes would be exceeded. Entries can also
+    expire after a time to live (TTL). Counts hits, misses, evictions and
+    expirations, to help size the cache from real traffic.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, ttl=None,
+                 policy='lru', size_function=sys.getsizeof,
+                 clock=time.monotonic):
+        """Initialise empty cache
+
+        Parameters
+        ----------
+        max_entries : int, optional
+            Maximum number of entries; None for no limit
+        max_bytes : int, optional
+            Maximum total size of values, as measured by size_function; None
+            for no limit
+        ttl : float, optional
+            Default number of seconds after being put that an entry expires;
+            None for no expiry
+        policy : str or policy object, optional
+            'lru', 'lfu' or 'fifo', or an object with on_insert, on_access,
+            on_remove and victim methods (see LRUPolicy)
+        size_function : function, optional
+            Maps a value to its size in bytes; only used if max_bytes is set
+        clock : function, optional
+            Returns current time in seconds
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_function = size_function
+        self.clock = clock
+
+        if isinstance(policy, str):
+            policy = POLICIES[policy]()
+        self.policy = policy
+
+        # Maps key to CacheEntry
+        self.entries = HashTable(8)
+
+        self.size = 0
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _is_expired(self, entry):
+        return entry.expires_at is not None and self.clock() >= entry.expires_at
+
+    def _remove_entry(self, entry):
+        """Remove entry from hash table and eviction policy
+        """
+        self.entries.delete(entry.key)
+        self.policy.on_remove(entry)
+        self.size -= 1
+        self.total_bytes -= entry.num_bytes
+
+    def get(self, key, default=None):
+        """Return value of key, or default if key is not cached (or has
+        expired)
+
+        Parameters
+        ----------
+        key
+            Key in cache
+        default : optional
+            Value to return on a cache miss
+
+        Returns
+        -------
+        Cached value, or default
+        """
+        try:
+            entry = self.entries.retrieve(key)
+        except KeyError:
+            self.misses += 1
+            return default
+
+        if self._is_expired(entry):
+            self._remove_entry(entry)
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self.policy.on_access(entry)
+
+        return entry.value
+
+    def put(self, key, value, ttl=None):
+        """Cache value under key, replacing any existing value, evicting
+        entries so that the cache stays within its limits.
+
+        Room for a new key is made before it is inserted, so that it can't
+        be chosen as the victim itself (with LFU, a new entry has the lowest
+        frequency, so would otherwise always be evicted once every other
+        entry had been read twice).
+
+        Parameters
+        ----------
+        key
+            Key in cache. Can be any non-mutable data type
+        value
+            Can be any python object
+        ttl : float, optional
+            Seconds until entry expires; defaults to the cache's ttl
+        """
+        if ttl is None:
+            ttl = self.ttl
+        expires_at = None if ttl is None else self.clock() + ttl
+
+        num_bytes = 0 if self.max_bytes is None else self.size_function(value)
+
+        try:
+            entry = self.entries.retrieve(key)
+        except KeyError:
+            self._evict(1, num_bytes)
+
+            entry = CacheEntry(key, value, num_bytes, expires_at)
+            self.entries.insert(key, entry)
+            self.policy.on_insert(entry)
+            self.size += 1
+            self.total_bytes += num_bytes
+        else:
+            # Update existing entry in place, counting as an access
+            self.total_bytes += num_bytes - entry.num_bytes
+            entry.value = value
+            entry.num_bytes = num_bytes
+            entry.expires_at = expires_at
+            self.policy.on_access(entry)
+
+        self._evict()
+
+    def _evict(self, extra_entries=0, extra_bytes=0):
+        """Evict entries chosen by the eviction policy until the cache is
+        within max_entries and max_bytes, with room for extra_entries more
+        entries of extra_bytes in total (or until it is empty)
+        """
+        while self.size > 0 and (
+                (self.max_entries is not None and
+                 self.size + extra_entries > self.max_entries) or
+                (self.max_bytes is not None and
+                 self.total_bytes + extra_bytes > self.max_bytes)):
+            self._remove_entry(self.policy.victim())
+            self.evictions += 1
+
+    def delete(self, key):
+        """Remove key from cache, raising a KeyError if it is not cached
+        """
+        self._remove_entry(self.entries.retrieve(key))
+
+    def expire(self):
+        """Remove all expired entries. Expired entries are otherwise only
+        removed when accessed, or evicted by the eviction policy.
+        """
+        expired = [
+            entry for key, entry in self.entries.items()
+            if self._is_expired(entry)
+        ]
+
+        for entry in expired:
+            self._remove_entry(entry)
+            self.expirations += 1
+
+    def stats(self):
+        """Return hit, miss, eviction and expiration counts, and current size
+
+        Returns
+        -------
+        dict
+            Counters, plus hit_rate (fraction of gets that were hits)
+        """
+        lookups = self.hits + self.misses
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'size': self.size,
+            'total_bytes': self.total_bytes,
+        }
+
+    def memoize(self, function):
+        """Decorator that caches function's results in this cache, keyed by
+        its arguments (which must be hashable)
+
+        Parameters
+        ----------
+        function : function
+            Function to memoize
+
+        Returns
+        -------
+        function
+            Wrapped function, with a cache attribute referencing this cache
+        """
+        missing = object()
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            key = (function.__qualname__, args, tuple(sorted(kwargs.items())))
+
+            result = self.get(key, missing)
+            if result is missing:
+                result = function(*args, **kwargs)
+                self.put(key, result)
+
+            return result
+
+        wrapper.cache = self
+
+        return wrapper
+
+
+def memoize(max_entries=128, **kwargs):
+    """Decorator factory that memoizes a function in its own Cache
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        Maximum number of results to cache
+    **kwargs
+        Passed on to Cache (e.g. ttl, policy)
+
+    Returns
+    -------
+    function
+        Decorator
+    """
+    return Cache(max_entries=max_entries, **kwargs).memoize
+
+
+if __name__ == '__main__':
+
+    c = Cache(max_entries=2)
+    c.put('a', 1)
+    c.put('b', 2)
+    c.get('a')
+    c.put('c', 3)
+    print('LRU keeps a and c:', c.get('a'), c.get('b'), c.get('c'))
+
+    c = Cache(max_entries=2, policy='lfu')
+    c.put('a', 1)
+    c.get('a')
+    c.put('b', 2)
+    c.put('c', 3)
+    print('LFU keeps a and c:', c.get('a'), c.get('b'), c.get('c'))
+
+    # LFU admission: a new key must be cached even when every other entry
+    # has been read more often than it
+    c = Cache(max_entries=2, policy='lfu')
+    c.put('a', 1)
+    c.get('a')
+    c.put('b', 2)
+    c.get('b')
+    c.put('c', 3)
+    assert c.get('c') == 3
+    print('LFU admits c, evicting a:', c.get('a'), c.get('b'), c.get('c'))
+
+    c = Cache(max_entries=2, policy='fifo')
+    c.put('a', 1)
+    c.put('b', 2)
+    c.get('a')
+    c.put('c', 3)
+    print('FIFO keeps b and c:', c.get('a'), c.get('b'), c.get('c'))
+
+    # Expiry
+    c = Cache(ttl=0.01)
+    c.put('a', 1)
+    time.sleep(0.02)
+    print('expired:', c.get('a', 'gone'))
+    print(c.stats())
+
+    @memoize(max_entries=1000)
+    def fibonacci(n):
+        return n if n < 2 else fibonacci(n - 1) + fibonacci(n - 2)
+
+    print(fibonacci(200))
+    print(fibonacci.cache.stats())
@@ -0,0 +1,460 @@
+import bisect
+import multiprocessing
+import random
+
+from data_structures.arrays_and_strings.bloom_filter import _mix64
+from data_structures.arrays_and_strings.hash_table import (
+    HashTable, fnv1a_hash
+)
+
+
+# Number of distinct positions on the ring
+_RING_SIZE = 1 << 64
+
+
+class ConsistentHashRing():
+    """Class to represent a consistent hashing ring, mapping keys to the
+    nodes (e.g. worker processes) that own them.
+
+    Each node is placed at several pseudo-random positions (virtual nodes)
+    on a ring of 64-bit hashes, in proportion to its weight. A key belongs to
+    the first virtual node after the key's hash, going round the ring. So
+    adding or removing a node only moves the keys next to its own virtual
+    nodes, about 1 / (number of nodes) of them, rather than almost every key
+    as with hash(key) % num_nodes.
+
+    Uses fnv1a_hash by default, so every process maps keys to the same
+    nodes. Nodes must be hashable by hash_function (e.g. str or int names).
+    """
+
+    def __init__(self, num_virtual_nodes=100, hash_function=fnv1a_hash):
+        """Initialise empty ring
+
+        Parameters
+        ----------
+        num_virtual_nodes : int, optional
+            Number of virtual nodes for a node of weight 1; more spreads keys
+            more evenly, at the cost of memory and slower membership changes
+        hash_function : function, optional
+            Maps keys, and (node, i) tuples, to unsigned 64-bit integers.
+            Must give the same results in every process using the ring
+        """
+        self.num_virtual_nodes = num_virtual_nodes
+        self.hash_function = hash_function
+
+        # Maps node to weight
+        self.weights = HashTable(8)
+
+        # Sorted positions of virtual nodes, and node owning each one
+        self.positions = []
+        self.owners = []
+
+    def _position(self, key):
+        """Map key (or (node, i) tuple) to its position on the ring.
+
+        The hash is scrambled first, since FNV-1a barely changes the high
+        bits of the hash between keys differing only in their last byte
+        (e.g. 'key1' and 'key2'), which would bunch them up on the ring.
+        """
+        return _mix64(self.hash_function(key))
+
+    def _virtual_node_positions(self, node, weight):
+        """Return ring positions of node's virtual nodes
+        """
+        num_virtual_nodes = max(1, int(round(self.num_virtual_nodes * weight)))
+
+        return [
+            self._position((node, i)) for i in range(num_virtual_nodes)
+        ]
+
+    def add_node(self, node, weight=1):
+        """Add node to ring, taking over the keys just before each of its
+        virtual nodes
+
+        Parameters
+        ----------
+        node
+            Name of node; any value hash_function accepts
+        weight : float, optional
+            Relative share of keys node should own
+        """
+        if self.weights.contains(node):
+            raise ValueError('Node {!r} already in ring.'.format(node))
+
+        self.weights.insert(node, weight)
+
+        new_positions = self._virtual_node_positions(node, weight)
+        virtual_nodes = sorted(
+            list(zip(self.positions, self.owners)) +
+            [(position, node) for position in new_positions],
+            key=lambda virtual_node: virtual_node[0]
+        )
+
+        self.positions = [position for position, owner in virtual_nodes]
+        self.owners = [owner for position, owner in virtual_nodes]
+
+    def remove_node(self, node):
+        """Remove node from ring, handing its keys to the nodes after its
+        virtual nodes. Raises a KeyError if node not in ring.
+        """
+        self.weights.delete(node)
+
+        virtual_nodes = [
+            (position, owner)
+            for position, owner in zip(self.positions, self.owners)
+            if owner != node
+        ]
+
+        self.positions = [position for position, owner in virtual_nodes]
+        self.owners = [owner for position, owner in virtual_nodes]
+
+    def nodes(self):
+        """Return list of nodes in ring, in no particular order
+        """
+        return [node for node, weight in self.weights.items()]
+
+    def get_node(self, key):
+        """Return node that owns key
+
+        Parameters
+        ----------
+        key
+            Any key accepted by hash_function
+
+        Returns
+        -------
+        Node whose virtual node is first after key's hash on the ring
+        """
+        if not self.positions:
+            raise KeyError('No nodes in hash ring.')
+
+        index = bisect.bisect_right(self.positions, self._position(key))
+
+        # Keys after the last virtual node wrap round to the first
+        return self.owners[index % len(self.owners)]
+
+    def ownership(self):
+        """Return fraction of all possible key hashes owned by each node
+
+        Returns
+        -------
+        dict
+            Maps node to fraction of ring, between 0 and 1
+        """
+        fractions = {node: 0.0 for node in self.nodes()}
+
+        for index, (position, owner) in enumerate(
+                zip(self.positions, self.owners)):
+            # Arc from previous virtual node's position (wrapping round for
+            # the first) up to this one's
+            previous_position = self.positions[index - 1]
+            arc_length = (position - previous_position) % _RING_SIZE
+            fractions[owner] += arc_length / _RING_SIZE
+
+        return fractions
+
+    def copy(self):
+        """Return independent copy of ring, e.g. to prepare a membership
+        change while the current ring is still in use
+        """
+        ring = ConsistentHashRing(self.num_virtual_nodes, self.hash_function)
+
+        for node, weight in self.weights.items():
+            ring.weights.insert(node, weight)
+
+        ring.positions = list(self.positions)
+        ring.owners = list(self.owners)
+
+        return ring
+
+
+def extract_moved_entries(table, node, ring):
+    """Delete, and return, the entries of node's table that ring assigns to
+    a different node
+
+    Parameters
+    ----------
+    table : HashTable
+        Entries currently stored by node
+    node
+        Node that owns table
+    ring : ConsistentHashRing
+        Ring after a membership change
+
+    Returns
+    -------
+    list of tuple
+        (key, value, new owner) for each moved entry
+    """
+    moved = []
+
+    for key, value in table.items():
+        owner = ring.get_node(key)
+        if owner != node:
+            moved.append((key, value, owner))
+
+    # Delete after iterating, since table can't be modified during items()
+    for key, value, owner in moved:
+        table.delete(key)
+
+    return moved
+
+
+def rebalance(ring, tables):
+    """Move entries between per-node HashTables so that each key is stored
+    by the node ring assigns it to. Only entries whose owner has changed are
+    moved.
+
+    Parameters
+    ----------
+    ring : ConsistentHashRing
+        Ring after a membership change
+    tables : dict
+        Maps node to its HashTable. Tables are created for nodes in ring
+        but not in tables, and removed for nodes no longer in ring
+
+    Returns
+    -------
+    int
+        Number of entries moved
+    """
+    moved = []
+
+    for node in list(tables):
+        moved.extend(extract_moved_entries(tables[node], node, ring))
+
+        if not ring.weights.contains(node):
+            del tables[node]
+
+    for node in ring.nodes():
+        if node not in tables:
+            tables[node] = HashTable(8)
+
+    for key, value, owner in moved:
+        tables[owner].insert(key, value)
+
+    return len(moved)
+
+
+def _serve_shard(node, connection):
+    """Run in a worker process: store one node's entries in a HashTable,
+    executing (command, arguments) requests received on connection, and
+    sending back ('ok', result) or ('error', exception)
+    """
+    table = HashTable(8)
+
+    commands = {
+        'insert': table.insert,
+        'retrieve': table.retrieve,
+        'delete': table.delete,
+        'size': lambda: table.size,
+        'extract': lambda ring: extract_moved_entries(table, node, ring),
+    }
+
+    while True:
+        command, arguments = connection.recv()
+
+        if command == 'stop':
+            connection.close()
+            return
+
+        try:
+            connection.send(('ok', commands[command](*arguments)))
+        except Exception as exception:
+            connection.send(('error', exception))
+
+
+class ShardRouter():
+    """Class to represent a stand-in for a network router, forwarding each
+    request to the local worker process that owns its key, according to a
+    ConsistentHashRing.
+
+    Each node is a multiprocessing.Process holding its entries in a
+    HashTable, reached through a Pipe. Adding or removing a node moves only
+    the entries whose owner changes.
+    """
+
+    def __init__(self, ring):
+        """Start a worker process for each node in ring
+
+        Parameters
+        ----------
+        ring : ConsistentHashRing
+            Ring assigning keys to nodes
+        """
+        self.ring = ring
+
+        # Maps node to (process, connection)
+        self.workers = HashTable(8)
+
+        for node in ring.nodes():
+            self._start_worker(node)
+
+    def _start_worker(self, node):
+        router_connection, worker_connection = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_serve_shard, args=(node, worker_connection), daemon=True
+        )
+        process.start()
+        self.workers.insert(node, (process, router_connection))
+
+    def _call(self, node, command, *arguments):
+        """Send request to node's worker and return its result, re-raising
+        any exception the worker raised
+        """
+        process, connection = self.workers.retrieve(node)
+        connection.send((command, arguments))
+
+        status, result = connection.recv()
+        if status == 'error':
+            raise result
+
+        return result
+
+    def insert(self, key, value):
+        self._call(self.ring.get_node(key), 'insert', key, value)
+
+    def retrieve(self, key):
+        return self._call(self.ring.get_node(key), 'retrieve', key)
+
+    def delete(self, key):
+        self._call(self.ring.get_node(key), 'delete', key)
+
+    def sizes(self):
+        """Return number of entries stored by each node
+
+        Returns
+        -------
+        dict
+            Maps node to number of entries
+        """
+        return {
+            node: self._call(node, 'size') for node in self.ring.nodes()
+        }
+
+    def _change_membership(self, new_ring):
+        """Switch to new_ring, moving entries whose owner has changed from
+        their old worker to their new one
+
+        Returns
+        -------
+        int
+            Number of entries moved
+        """
+        moved = []
+        for node in self.ring.nodes():
+            moved.extend(self._call(node, 'extract', new_ring))
+
+        self.ring = new_ring
+
+        for key, value, owner in moved:
+            self._call(owner, 'insert', key, value)
+
+        return len(moved)
+
+    def add_node(self, node, weight=1):
+        """Start a worker for node, and move the entries it now owns to it
+
+        Returns
+        -------
+        int
+            Number of entries moved
+        """
+        new_ring = self.ring.copy()
+        new_ring.add_node(node, weight)
+        self._start_worker(node)
+
+        return self._change_membership(new_ring)
+
+    def remove_node(self, node):
+        """Move node's entries to their new owners, then stop its worker
+
+        Returns
+        -------
+        int
+            Number of entries moved
+        """
+        new_ring = self.ring.copy()
+        new_ring.remove_node(node)
+        num_moved = self._change_membership(new_ring)
+
+        process, connection = self.workers.pop(node)
+        connection.send(('stop', ()))
+        process.join()
+
+        return num_moved
+
+    def close(self):
+        """Stop all worker processes
+        """
+        for node, (process, connection) in self.workers.items():
+            connection.send(('stop', ()))
+            process.join()
+
+        self.workers = HashTable(8)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == '__main__':
+
+    ring = ConsistentHashRing()
+    for node in ('worker0', 'worker1', 'worker2'):
+        ring.add_node(node)
+    ring.add_node('big_worker', weight=2)
+
+    print({
+        node: round(fraction, 3)
+        for node, fraction in sorted(ring.ownership().items())
+    })
+
+    # Local rebalancing: adding a fifth node should move about 1/5 of keys,
+    # where hash(key) % num_nodes would move about 4/5
+    num_keys = 20000
+    tables = {}
+    rebalance(ring, tables)
+    for i in range(num_keys):
+        tables[ring.get_node(i)].insert(i, i)
+
+    ring.add_node('worker3')
+    print('added node: moved {:.1%} of keys'.format(
+        rebalance(ring, tables) / num_keys
+    ))
+
+    ring.remove_node('worker0')
+    print('removed node: moved {:.1%} of keys'.format(
+        rebalance(ring, tables) / num_keys
+    ))
+
+    assert all(
+        ring.get_node(key) == node
+        for node, table in tables.items() for key, value in table.items()
+    )
+    assert sum(table.size for table in tables.values()) == num_keys
+
+    # Multi-process demo: one worker process per node, behind a router
+    ring = ConsistentHashRing()
+    for node in ('worker0', 'worker1', 'worker2'):
+        ring.add_node(node)
+
+    with ShardRouter(ring) as router:
+        num_keys = 2000
+        for i in range(num_keys):
+            router.insert('key{}'.format(i), i)
+        print('sizes:', router.sizes())
+
+        print('added worker3: moved {} of {} keys'.format(
+            router.add_node('worker3'), num_keys
+        ))
+        print('removed worker1: moved {} of {} keys'.format(
+            router.remove_node('worker1'), num_keys
+        ))
+        print('sizes:', router.sizes())
+
+        for i in random.sample(range(num_keys), 100):
+            assert router.retrieve('key{}'.format(i)) == i
+        print('all sampled keys found on their new owners')
@@ -0,0 +1,404 @@
+import random
+
+from data_structures.arrays_and_strings.bloom_filter import _mix64
+
+
+# Sentinel marking empty slots
+_EMPTY = object()
+
+# Number of failed rehashes after which keys that still can't be placed are
+# kept in the stash, beyond stash_size
+_MAX_REHASH_ATTEMPTS = 9
+
+
+class CuckooHashTable():
+    """Class to represent a hash table object that uses bucketized cuckoo
+    hashing, bounding the work done by every lookup.
+
+    Each key may only be stored in one of num_hash_functions candidate
+    buckets (one per hash function), each holding bucket_size slots, or in a
+    small stash of keys that could not be placed. So retrieve never checks
+    more than num_hash_functions * bucket_size + stash_size slots.
+
+    Inserting into a full candidate bucket evicts ('kicks out') a key, which
+    moves to one of its other candidate buckets, possibly evicting another
+    key, and so on. If this goes on for max_kicks moves, the insertion is
+    assumed to be stuck in a cycle and the homeless key goes into the stash;
+    if the stash is full, every key is rehashed with new hash functions.
+
+    Keys with equal hash() values share candidate buckets under every hash
+    function, so no rehash can separate more than num_hash_functions *
+    bucket_size + stash_size of them. After repeated failed rehashes, keys
+    left without a slot are kept in an overflowing stash instead, so the
+    bound on lookups only holds while the stash is within stash_size. Once
+    the stash has overflowed, later cycles add to it rather than rehashing
+    again, until deletions bring it back within stash_size.
+    """
+
+    def __init__(self, num_buckets=8, bucket_size=4, num_hash_functions=2,
+                 stash_size=4, max_kicks=100, max_load_factor=0.9):
+        """Initialise empty hash table
+
+        Parameters
+        ----------
+        num_buckets : int, optional
+            Initial number of buckets
+        bucket_size : int, optional
+            Number of slots in each bucket
+        num_hash_functions : int, optional
+            Number of candidate buckets for each key (at least 2)
+        stash_size : int, optional
+            Maximum number of keys held in the stash
+        max_kicks : int, optional
+            Number of evictions after which an insertion is treated as a
+            cycle
+        max_load_factor : float, optional
+            Maximum ratio of stored entries to slots, above which the number
+            of buckets is doubled
+        """
+        self.bucket_size = bucket_size
+        self.num_hash_functions = num_hash_functions
+        self.stash_size = stash_size
+        self.max_kicks = max_kicks
+        self.max_load_factor = max_load_factor
+
+        self.size = 0
+
+        # Number of insertions that detected a cycle, number of rehashes
+        # with new hash functions caused by cycles, and number of times the
+        # table has doubled in size (counting only growth that was kept)
+        self.cycle_count = 0
+        self.rehash_count = 0
+        self.grow_count = 0
+
+        self._random = random.Random()
+        self._allocate(num_buckets)
+
+    def _allocate(self, num_buckets):
+        """Replace slots and stash with empty ones, and choose new hash
+        functions
+
+        Parameters
+        ----------
+        num_buckets : int
+            Number of buckets
+        """
+        self.num_buckets = num_buckets
+
+        # Slots of bucket b are at indexes b * bucket_size onwards
+        num_slots = num_buckets * self.bucket_size
+        self.key_array = [_EMPTY] * num_slots
+        self.value_array = [None] * num_slots
+
+        # List of [key, value] pairs, and whether it holds more than
+        # stash_size of them after rehashing failed to place every key
+        self.stash = []
+        self.stash_overflowed = False
+
+        # One random seed per hash function
+        self.seeds = [
+            self._random.getrandbits(64)
+            for i in range(self.num_hash_functions)
+        ]
+
+    def _candidate_buckets(self, key):
+        """Return index of each bucket that key may be stored in
+
+        Parameters
+        ----------
+        key
+            Key in key value store. Can be any non-mutable data type
+
+        Returns
+        -------
+        list of int
+            One bucket index per hash function
+        """
+        py_hashed_key = hash(key)
+
+        return [
+            _mix64(py_hashed_key ^ seed) % self.num_buckets
+            for seed in self.seeds
+        ]
+
+    def max_probes(self):
+        """Return maximum number of slots any retrieve can check
+
+        Returns
+        -------
+        int
+            Slots in all candidate buckets, plus stash (which only outgrows
+            stash_size when many keys share a hash() value)
+        """
+        return (self.num_hash_functions * self.bucket_size +
+                max(self.stash_size, len(self.stash)))
+
+    def _find_slot(self, key):
+        """Return index of the slot holding key, or -1 if key is not in a slot
+        (it may still be in the stash)
+        """
+        key_array = self.key_array
+
+        for bucket in self._candidate_buckets(key):
+            start = bucket * self.bucket_size
+            for slot in range(start, start + self.bucket_size):
+                stored_key = key_array[slot]
+                if stored_key is not _EMPTY and stored_key == key:
+                    return slot
+
+        return -1
+
+    def _find_stash_index(self, key):
+        """Return index in stash of key's [key, value] pair, or -1
+        """
+        for stash_index, (stored_key, value) in enumerate(self.stash):
+            if stored_key == key:
+                return stash_index
+
+        return -1
+
+    def retrieve(self, key):
+        """Retrieve a value from the hash table based on its key, checking at
+        most max_probes() slots
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed). Can be any non-mutable data
+            type
+
+        Returns
+        -------
+        Value corresponding to input key. Can be any python object.
+        """
+        slot = self._find_slot(key)
+        if slot != -1:
+            return self.value_array[slot]
+
+        stash_index = self._find_stash_index(key)
+        if stash_index != -1:
+            return self.stash[stash_index][1]
+
+        raise KeyError('Key not found in hash table.')
+
+    def contains(self, key):
+        """Return True if key is stored in hash table, False if not
+        """
+        return self._find_slot(key) != -1 or self._find_stash_index(key) != -1
+
+    def insert(self, key, value):
+        """Insert key, value pair into hash table, overwriting the value of
+        key if it is already present
+
+        Parameters
+        ----------
+        key
+            Key in key value store. Can be any non-mutable data type
+        value
+            Can be any python object
+        """
+        slot = self._find_slot(key)
+        if slot != -1:
+            self.value_array[slot] = value
+            return
+
+        stash_index = self._find_stash_index(key)
+        if stash_index != -1:
+            self.stash[stash_index][1] = value
+            return
+
+        self.size += 1
+
+        # Grow if too full; otherwise cycles become likely
+        if self.size > (self.max_load_factor * self.num_buckets *
+                        self.bucket_size):
+            self._rehash(2 * self.num_buckets, [(key, value)], growing=True)
+            return
+
+        homeless = self._place(key, value)
+        if homeless is not None:
+            self._rehash(self.num_buckets, [homeless])
+
+    def _place(self, key, value):
+        """Store a key known not to be in the hash table, kicking out other
+        keys if necessary.
+
+        Parameters
+        ----------
+        key
+            Key in key value store. Can be any non-mutable data type
+        value
+            Can be any python object
+
+        Returns
+        -------
+        tuple or None
+            None on success; otherwise the (key, value) pair left without a
+            slot, which may not be the input pair
+        """
+        key_array = self.key_array
+        value_array = self.value_array
+
+        for kick in range(self.max_kicks + 1):
+            candidate_buckets = self._candidate_buckets(key)
+
+            # Use an empty slot in any candidate bucket, if there is one
+            for bucket in candidate_buckets:
+                start = bucket * self.bucket_size
+                for slot in range(start, start + self.bucket_size):
+                    if key_array[slot] is _EMPTY:
+                        key_array[slot] = key
+                        value_array[slot] = value
+                        return None
+
+            # All candidates full: swap with a random occupant, which then
+            # needs a new home
+            bucket = self._random.choice(candidate_buckets)
+            slot = (bucket * self.bucket_size +
+                    self._random.randrange(self.bucket_size))
+            key, key_array[slot] = key_array[slot], key
+            value, value_array[slot] = value_array[slot], value
+
+        # Too many kicks: probably a cycle. Fall back on the stash, or keep
+        # overflowing it if rehashing has already been shown not to help
+        self.cycle_count += 1
+
+        if len(self.stash) < self.stash_size or self.stash_overflowed:
+            self.stash.append([key, value])
+            return None
+
+        return key, value
+
+    def _rehash(self, num_buckets, extra_items, growing=False):
+        """Choose new hash functions and reinsert every entry, doubling the
+        number of buckets after repeated failures
+
+        Parameters
+        ----------
+        num_buckets : int
+            Number of buckets to rehash into
+        extra_items : list of tuple
+            (key, value) pairs not currently in a slot or the stash
+        growing : bool, optional
+            True if rehashing to grow the table, rather than to escape a cycle
+        """
+        items = [
+            (key, value)
+            for key, value in zip(self.key_array, self.value_array)
+            if key is not _EMPTY
+        ]
+        items.extend((key, value) for key, value in self.stash)
+        items.extend(extra_items)
+
+        if not growing:
+            self.rehash_count += 1
+
+        old_num_buckets = self.num_buckets
+        requested_num_buckets = num_buckets
+
+        attempts = 0
+        while True:
+            if attempts == _MAX_REHASH_ATTEMPTS:
+                # Growing didn't help either, so don't keep the extra buckets
+                num_buckets = requested_num_buckets
+            self._allocate(num_buckets)
+
+            for key, value in items:
+                homeless = self._place(key, value)
+                if homeless is None:
+                    continue
+
+                if attempts < _MAX_REHASH_ATTEMPTS:
+                    break
+
+                # Rehashing isn't helping (e.g. too many keys with equal
+                # hash() values), so stop growing and overflow the stash
+                self.stash.append(list(homeless))
+                self.stash_overflowed = True
+            else:
+                # Count the doublings kept by the final layout
+                if num_buckets > old_num_buckets:
+                    self.grow_count += (
+                        (num_buckets // old_num_buckets).bit_length() - 1
+                    )
+                return
+
+            # Stuck again: retry with new hash functions, growing after a few
+            # tries
+            self.rehash_count += 1
+            attempts += 1
+            if attempts % 3 == 0:
+                num_buckets *= 2
+
+    def delete(self, key):
+        """Delete key, and its value, from hash table, raising a KeyError if
+        key not found
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed). Can be any non-mutable data
+            type
+        """
+        slot = self._find_slot(key)
+
+        if slot != -1:
+            self.key_array[slot] = _EMPTY
+            self.value_array[slot] = None
+        else:
+            stash_index = self._find_stash_index(key)
+            if stash_index == -1:
+                raise KeyError('Key not found in hash table.')
+            del self.stash[stash_index]
+            if len(self.stash) <= self.stash_size:
+                self.stash_overflowed = False
+
+        self.size -= 1
+
+    def load_factor(self):
+        """Return ratio of stored entries to number of slots
+        """
+        return self.size / (self.num_buckets * self.bucket_size)
+
+    def stats(self):
+        """Return counts of rehashes and detected insertion cycles, and the
+        current layout
+
+        Returns
+        -------
+        dict
+            size, num_buckets, load_factor, stash_used, max_probes,
+            cycle_count, rehash_count, grow_count
+        """
+        return {
+            'size': self.size,
+            'num_buckets': self.num_buckets,
+            'load_factor': self.load_factor(),
+            'stash_used': len(self.stash),
+            'max_probes': self.max_probes(),
+            'cycle_count': self.cycle_count,
+            'rehash_count': self.rehash_count,
+            'grow_count': self.grow_count,
+        }
+
+
+if __name__ == '__main__':
+
+    c = CuckooHashTable()
+
+    for i in range(10000):
+        c.insert('key{}'.format(i), i)
+
+    print(c.retrieve('key1234'))
+    c.delete('key1234')
+    print(c.contains('key1234'))
+
+    print(c.stats())
+
+    # A high max_load_factor makes insertion cycles, and rehashes, common
+    c = CuckooHashTable(
+        bucket_size=1, stash_size=2, max_kicks=20, max_load_factor=0.45
+    )
+    for i in range(10000):
+        c.insert(i, i)
+    print(c.stats())
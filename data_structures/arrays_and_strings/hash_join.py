@@ -0,0 +1,579 @@
+import operator
+import os
+import pickle
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from data_structures.arrays_and_strings.bloom_filter import _mix64
+from data_structures.arrays_and_strings.hash_table import HashTable
+
+
+# Number of times a worker splits a partition that is too large for
+# memory_budget into smaller ones, each time with a different hash, before
+# processing it in memory anyway (e.g. when most rows share one key)
+_MAX_REPARTITION_DEPTH = 4
+
+# Number of smaller partitions an oversized partition is split into
+_REPARTITION_FANOUT = 8
+
+# Reducers for group_by's named aggregates. Built-in and operator functions
+# are pickled by name, so can be sent to worker processes. count reduces a 1
+# per row with operator.add
+AGGREGATES = {
+    'count': operator.add,
+    'sum': operator.add,
+    'min': min,
+    'max': max,
+}
+
+
+class Partitioner():
+    """Class to split a stream of records into num_partitions partitions by
+    the hash of their key (the first element of each record), so that all
+    records with equal keys end up in the same partition.
+
+    Records are buffered in memory, one list per partition. Once the buffers
+    hold more than memory_budget records in total, every buffer is appended
+    to its partition's temporary spill file (as a pickled list) and emptied,
+    so memory use stays bounded however many records are added.
+
+    A partition that turns out too large can be split again by another
+    Partitioner with a different salt, which scatters its keys independently
+    of the first split.
+    """
+
+    def __init__(self, num_partitions, memory_budget=None, spill_dir=None,
+                 salt=0):
+        """Initialise empty partitions
+
+        Parameters
+        ----------
+        num_partitions : int
+            Number of partitions
+        memory_budget : int, optional
+            Maximum number of records buffered in memory before spilling to
+            disk; None to never spill
+        spill_dir : str, optional
+            Directory for spill files; defaults to the system temp directory
+        salt : int, optional
+            Mixed into each key's hash, to vary the partitioning
+        """
+        self.num_partitions = num_partitions
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.salt = salt
+
+        self.buffers = [[] for i in range(num_partitions)]
+        self.spill_paths = [None] * num_partitions
+        self.num_buffered = 0
+
+        # Number of times buffers were spilled, and records written to disk
+        self.spill_count = 0
+        self.records_spilled = 0
+
+    def partition_index(self, key):
+        """Map key to the index of its partition.
+
+        The hash is scrambled first, since each partition's HashTable also
+        takes hash(key) modulo its array length; otherwise all of a
+        partition's keys would fall in a few linked lists.
+        """
+        return _mix64(hash(key) ^ self.salt) % self.num_partitions
+
+    def add(self, record):
+        """Add record to its key's partition, spilling buffers to disk if
+        this exceeds memory_budget
+
+        Parameters
+        ----------
+        record : tuple
+            Record whose first element is its (hashable) key
+        """
+        if self.num_partitions == 1:
+            self.buffers[0].append(record)
+        else:
+            self.buffers[self.partition_index(record[0])].append(record)
+
+        self.num_buffered += 1
+
+        if (self.memory_budget is not None and
+                self.num_buffered > self.memory_budget):
+            self.spill()
+
+    def spill(self):
+        """Append every non-empty buffer to its partition's spill file, and
+        empty the buffers
+        """
+        for index, buffer in enumerate(self.buffers):
+            if not buffer:
+                continue
+
+            if self.spill_paths[index] is None:
+                file_descriptor, self.spill_paths[index] = tempfile.mkstemp(
+                    prefix='partition{}_'.format(index), dir=self.spill_dir
+                )
+                os.close(file_descriptor)
+
+            with open(self.spill_paths[index], 'ab') as file:
+                pickle.dump(buffer, file, pickle.HIGHEST_PROTOCOL)
+
+            self.records_spilled += len(buffer)
+            self.buffers[index] = []
+
+        self.num_buffered = 0
+        self.spill_count += 1
+
+    def sources(self):
+        """Return each partition's contents, as (spill path, buffered
+        records) pairs that can be read with read_partition (in this, or
+        another, process)
+
+        Returns
+        -------
+        list of tuple
+            One (str or None, list) pair per partition
+        """
+        return list(zip(self.spill_paths, self.buffers))
+
+    def cleanup(self):
+        """Delete all spill files
+        """
+        for path in self.spill_paths:
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+        self.spill_paths = [None] * self.num_partitions
+
+
+def read_partition(source):
+    """Yield every record of a partition: first those spilled to disk, then
+    those still buffered in memory
+
+    Parameters
+    ----------
+    source : tuple
+        (spill path, buffered records) pair, from Partitioner.sources
+
+    Yields
+    ------
+    tuple
+        Records, in the order they were added
+    """
+    spill_path, records = source
+
+    if spill_path is not None:
+        with open(spill_path, 'rb') as file:
+            while True:
+                try:
+                    chunk = pickle.load(file)
+                except EOFError:
+                    break
+                yield from chunk
+
+    yield from records
+
+
+def _finish_output(output):
+    """Return records collected by a worker in a form that can be sent back
+    to the parent process: output spilled to disk is only sent as a path
+    """
+    if output.spill_paths[0] is not None:
+        output.spill()
+
+    return output.sources()[0]
+
+
+def _repartition(source, memory_budget, spill_dir, depth):
+    """Split a partition too large for memory_budget into
+    _REPARTITION_FANOUT smaller ones, using a hash salted by depth (so the
+    keys that were all sent to this partition are scattered again)
+
+    Returns
+    -------
+    Partitioner
+        Holding the smaller partitions, spilled to disk beyond memory_budget
+    """
+    partitioner = Partitioner(
+        _REPARTITION_FANOUT, memory_budget, spill_dir, salt=depth
+    )
+
+    try:
+        for record in read_partition(source):
+            partitioner.add(record)
+    except BaseException:
+        partitioner.cleanup()
+        raise
+
+    return partitioner
+
+
+def _join_into(output, left_source, right_source, memory_budget, spill_dir,
+               depth):
+    """Inner join one partition into output: build a HashTable of its left
+    records, then probe it with each right record. If there are more than
+    memory_budget left records, split both sides again and join each pair of
+    smaller partitions instead (as in a Grace hash join).
+    """
+    # Maps key to list of left rows with that key
+    build_table = HashTable(8)
+    num_rows = 0
+
+    for key, row in read_partition(left_source):
+        num_rows += 1
+        if (memory_budget is not None and num_rows > memory_budget and
+                depth < _MAX_REPARTITION_DEPTH):
+            break
+
+        try:
+            build_table.retrieve(key).append(row)
+        except KeyError:
+            build_table.insert(key, [row])
+
+    else:
+        for key, right_row in read_partition(right_source):
+            try:
+                left_rows = build_table.retrieve(key)
+            except KeyError:
+                continue
+
+            for left_row in left_rows:
+                output.add((key, left_row, right_row))
+
+        return
+
+    # Too many left rows to hold in memory: free them, and split both sides
+    build_table = None
+    left_parts = _repartition(left_source, memory_budget, spill_dir, depth + 1)
+
+    try:
+        right_parts = _repartition(
+            right_source, memory_budget, spill_dir, depth + 1
+        )
+        try:
+            for left_part, right_part in zip(left_parts.sources(),
+                                             right_parts.sources()):
+                _join_into(
+                    output, left_part, right_part, memory_budget, spill_dir,
+                    depth + 1
+                )
+        finally:
+            right_parts.cleanup()
+    finally:
+        left_parts.cleanup()
+
+
+def _join_partition(left_source, right_source, memory_budget, spill_dir):
+    """Inner join one partition. Runs in a worker process.
+
+    Returns
+    -------
+    tuple
+        (spill path, records) source of (key, left_row, right_row) records
+    """
+    output = Partitioner(1, memory_budget, spill_dir)
+
+    try:
+        _join_into(
+            output, left_source, right_source, memory_budget, spill_dir, 0
+        )
+    except BaseException:
+        output.cleanup()
+        raise
+
+    return _finish_output(output)
+
+
+def _group_into(output, source, reducer, memory_budget, spill_dir, depth):
+    """Aggregate one partition's values by key into output, in a HashTable
+    mapping key to running result. If there are more than memory_budget
+    distinct keys, split the partition again and aggregate each smaller
+    partition instead.
+    """
+    results = HashTable(8)
+
+    for key, value in read_partition(source):
+        try:
+            result = results.retrieve(key)
+        except KeyError:
+            if (memory_budget is not None and
+                    results.size >= memory_budget and
+                    depth < _MAX_REPARTITION_DEPTH):
+                break
+            results.insert(key, value)
+        else:
+            results.insert(key, reducer(result, value))
+
+    else:
+        for record in results.items():
+            output.add(record)
+
+        return
+
+    # Too many distinct keys to hold in memory: free them, and split source
+    results = None
+    parts = _repartition(source, memory_budget, spill_dir, depth + 1)
+
+    try:
+        for part in parts.sources():
+            _group_into(
+                output, part, reducer, memory_budget, spill_dir, depth + 1
+            )
+    finally:
+        parts.cleanup()
+
+
+def _group_partition(source, reducer, memory_budget, spill_dir):
+    """Aggregate one partition's values by key. Runs in a worker process.
+
+    Returns
+    -------
+    tuple
+        (spill path, records) source of (key, result) records
+    """
+    output = Partitioner(1, memory_budget, spill_dir)
+
+    try:
+        _group_into(output, source, reducer, memory_budget, spill_dir, 0)
+    except BaseException:
+        output.cleanup()
+        raise
+
+    return _finish_output(output)
+
+
+def _key_function(key):
+    """Return function extracting a row's key, given either a function or
+    an index into each row
+    """
+    if callable(key):
+        return key
+    return operator.itemgetter(key)
+
+
+def _remove_output(output_source):
+    """Delete an output source's spill file, if it has one
+    """
+    if output_source[0] is not None and os.path.exists(output_source[0]):
+        os.remove(output_source[0])
+
+
+def _stream_outputs(executor, function, *iterables):
+    """Run function on each partition in executor, yielding the records it
+    outputs and deleting their spill files once read.
+
+    If the caller stops early (closing this generator) or a worker fails,
+    partitions not yet started are cancelled, and the spill files of every
+    other output are deleted.
+    """
+    futures = [
+        executor.submit(function, *arguments) for arguments in zip(*iterables)
+    ]
+
+    try:
+        for future in futures:
+            output_source = future.result()
+            try:
+                yield from read_partition(output_source)
+            finally:
+                _remove_output(output_source)
+    finally:
+        for future in futures:
+            if future.cancel():
+                continue
+
+            # Already run (or running): wait for it, to delete its output
+            try:
+                _remove_output(future.result())
+            except Exception:
+                pass
+
+
+def hash_join(left, right, left_key=0, right_key=None, num_partitions=None,
+              max_workers=None, memory_budget=None, spill_dir=None):
+    """Inner join two iterables of rows on equal keys, using a partitioned
+    hash join spread over a pool of processes.
+
+    Both inputs are hash-partitioned by key (spilling to disk beyond
+    memory_budget), then each worker process joins one partition at a time:
+    it builds a HashTable of the partition's left rows and probes it with the
+    right rows. Joined rows are streamed out partition by partition, so in no
+    particular order.
+
+    Rows and keys are pickled to reach the workers. Each partition's left
+    rows must fit in a worker's memory, so put the smaller input on the left,
+    and raise num_partitions for large inputs.
+
+    Parameters
+    ----------
+    left : iterable
+        Rows of left (build) input
+    right : iterable
+        Rows of right (probe) input
+    left_key : function or int, optional
+        Function mapping a left row to its key, or index of the key in each
+        row; called in this process, so may be a lambda
+    right_key : function or int, optional
+        Same, for right rows; defaults to left_key
+    num_partitions : int, optional
+        Number of partitions; defaults to 4 per worker process
+    max_workers : int, optional
+        Number of worker processes; defaults to the number of CPUs
+    memory_budget : int, optional
+        Maximum number of rows buffered in memory, by the partitioning and
+        by each worker's output, before spilling to disk; None to never
+        spill. A worker given a partition too large to process within it
+        splits the partition again, with a different hash
+    spill_dir : str, optional
+        Directory for spill files; defaults to the system temp directory
+
+    Yields
+    ------
+    tuple
+        (key, left_row, right_row) for every pair of rows with equal keys
+    """
+    if right_key is None:
+        right_key = left_key
+    left_key = _key_function(left_key)
+    right_key = _key_function(right_key)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if num_partitions is None:
+        num_partitions = 4 * max_workers
+
+    left_partitioner = Partitioner(num_partitions, memory_budget, spill_dir)
+    right_partitioner = Partitioner(num_partitions, memory_budget, spill_dir)
+
+    try:
+        for row in left:
+            left_partitioner.add((left_key(row), row))
+        for row in right:
+            right_partitioner.add((right_key(row), row))
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            yield from _stream_outputs(
+                executor, _join_partition,
+                left_partitioner.sources(), right_partitioner.sources(),
+                [memory_budget] * num_partitions, [spill_dir] * num_partitions
+            )
+    finally:
+        left_partitioner.cleanup()
+        right_partitioner.cleanup()
+
+
+def group_by(rows, key=0, value=None, aggregate='count', num_partitions=None,
+             max_workers=None, memory_budget=None, spill_dir=None):
+    """Aggregate values of rows with equal keys, using a HashTable per
+    partition spread over a pool of processes.
+
+    Rows are hash-partitioned by key (spilling to disk beyond memory_budget),
+    then each worker process reduces one partition at a time. Results are
+    streamed out partition by partition, so in no particular order.
+
+    Parameters
+    ----------
+    rows : iterable
+        Input rows
+    key : function or int, optional
+        Function mapping a row to its key, or index of the key in each row;
+        called in this process, so may be a lambda
+    value : function or int, optional
+        Function mapping a row to the value to aggregate, or its index in
+        each row; defaults to the whole row. Ignored by 'count'
+    aggregate : str or function, optional
+        'count', 'sum', 'min' or 'max', or a reducer function combining a
+        running result and the next value into a new result (the first value
+        of each key is its initial result). Runs in the worker processes, so
+        must be picklable: a module-level function, not a lambda
+    num_partitions : int, optional
+        Number of partitions; defaults to 4 per worker process
+    max_workers : int, optional
+        Number of worker processes; defaults to the number of CPUs
+    memory_budget : int, optional
+        Maximum number of rows buffered in memory, by the partitioning and
+        by each worker's output, before spilling to disk; None to never
+        spill. A worker given a partition too large to process within it
+        splits the partition again, with a different hash
+    spill_dir : str, optional
+        Directory for spill files; defaults to the system temp directory
+
+    Yields
+    ------
+    tuple
+        (key, result) for every distinct key
+    """
+    key = _key_function(key)
+
+    if aggregate == 'count':
+        value = lambda row: 1
+    elif value is None:
+        value = lambda row: row
+    else:
+        value = _key_function(value)
+
+    reducer = AGGREGATES.get(aggregate, aggregate)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if num_partitions is None:
+        num_partitions = 4 * max_workers
+
+    partitioner = Partitioner(num_partitions, memory_budget, spill_dir)
+
+    try:
+        for row in rows:
+            partitioner.add((key(row), value(row)))
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            yield from _stream_outputs(
+                executor, _group_partition, partitioner.sources(),
+                [reducer] * num_partitions, [memory_budget] * num_partitions,
+                [spill_dir] * num_partitions
+            )
+    finally:
+        partitioner.cleanup()
+
+
+if __name__ == '__main__':
+
+    customers = [(1, 'Ann'), (2, 'Bob'), (3, 'Cat')]
+    orders = [(1, 9.99), (1, 5.00), (3, 2.50), (4, 1.00)]
+
+    for key, customer, order in sorted(hash_join(customers, orders)):
+        print(key, customer[1], order[1])
+
+    print(sorted(group_by(orders, value=1, aggregate='sum')))
+    print(sorted(group_by(orders, aggregate='count')))
+
+    # Throughput by number of worker processes (only scales on a machine
+    # with that many cores), and with a memory budget forcing spills
+    num_rows = 200000
+    left = [(i, 'row{}'.format(i)) for i in range(num_rows)]
+    right = [
+        (random.randrange(num_rows), random.random()) for i in range(num_rows)
+    ]
+
+    for max_workers, memory_budget in ((1, None), (os.cpu_count(), None),
+                                       (os.cpu_count(), 50000)):
+        start = time.perf_counter()
+        num_joined = sum(1 for row in hash_join(
+            left, right, max_workers=max_workers, memory_budget=memory_budget
+        ))
+        join_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        num_groups = sum(1 for row in group_by(
+            right, value=1, aggregate='max', max_workers=max_workers,
+            memory_budget=memory_budget
+        ))
+        group_time = time.perf_counter() - start
+
+        print(
+            '{} workers, memory budget {}: join {:.2f}s ({} rows), '
+            'group by {:.2f}s ({} groups)'.format(
+                max_workers, memory_budget, join_time, num_joined,
+                group_time, num_groups
+            )
+        )
@@ -1,6 +1,128 @@
+import functools
+import itertools
+import math
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import time
+import tracemalloc
+
+from data_structures.arrays_and_strings.bloom_filter import BloomFilter
 from data_structures.linked_lists.singly_linked_list import LinkedList
 
 
+# Sentinel for pop's default argument, since None is a valid default
+_NO_DEFAULT = object()
+
+# HashTable methods wrapped by enable_instrumentation
+_INSTRUMENTED_OPERATIONS = (
+    'insert', 'retrieve', 'contains', 'delete', 'pop',
+    'insert_many', 'retrieve_many', 'contains_many',
+)
+
+# Sentinels marking never-used and deleted slots in OpenAddressingHashTable
+_EMPTY = object()
+_TOMBSTONE = object()
+
+# 2**64 divided by the golden ratio, used to scramble hashes before probing
+_FIBONACCI_MULTIPLIER = 11400714819323198485
+_MASK_64 = (1 << 64) - 1
+
+# FNV-1a 64-bit parameters
+_FNV_OFFSET_BASIS = 14695981039346656037
+_FNV_PRIME = 1099511628211
+
+# Header of files written by HashTable.save: magic bytes, number of buckets,
+# number of entries and hash seed
+_SNAPSHOT_MAGIC = b'HTSNAP01'
+_SNAPSHOT_HEADER = struct.Struct('<8sQQQ')
+
+# Each record in a snapshot: full key hash, key length, value length
+_SNAPSHOT_RECORD = struct.Struct('<QII')
+
+# Unsigned 64-bit integer, used for snapshot offset tables
+_UINT64 = struct.Struct('<Q')
+
+
+def _stable_key_bytes(key):
+    """Encode key as bytes, in a way that doesn't vary between Python
+    processes, and such that keys that compare equal (e.g. 1, 1.0 and True)
+    have the same encoding.
+
+    Parameters
+    ----------
+    key
+        None, or a bool, int, float, str, bytes, or tuple of these
+
+    Returns
+    -------
+    bytes
+        Type-tagged encoding of key
+    """
+    if key is None:
+        return b'N'
+
+    # Equal numbers must encode identically, whatever their type
+    if isinstance(key, float) and key.is_integer():
+        key = int(key)
+
+    if isinstance(key, int):
+        return b'i' + str(int(key)).encode('ascii')
+
+    if isinstance(key, float):
+        return b'f' + struct.pack('<d', key)
+
+    if isinstance(key, str):
+        return b's' + key.encode('utf-8', 'surrogatepass')
+
+    if isinstance(key, bytes):
+        return b'b' + key
+
+    if isinstance(key, tuple):
+        # Length-prefix each element, so ('ab', 'c') != ('a', 'bc')
+        parts = [b't']
+        for element in key:
+            element_bytes = _stable_key_bytes(element)
+            parts.append(_UINT64.pack(len(element_bytes)))
+            parts.append(element_bytes)
+        return b''.join(parts)
+
+    raise TypeError(
+        'Stable hashing not supported for {} keys'.format(type(key).__name__)
+    )
+
+
+def fnv1a_hash(key, seed=0):
+    """Hash key with the 64-bit FNV-1a algorithm.
+
+    Unlike Python's built-in hash(), the result is the same in every Python
+    process, so can be used to lay out hash tables that are saved to disk or
+    shared between processes. Pass as the hash_function of a HashTable (with
+    functools.partial to set a seed).
+
+    Parameters
+    ----------
+    key
+        None, or a bool, int, float, str, bytes, or tuple of these
+    seed : int, optional
+        Unsigned 64-bit seed, hashed before key, to vary the hash function
+
+    Returns
+    -------
+    int
+        Unsigned 64-bit hash of key
+    """
+    hashed = _FNV_OFFSET_BASIS
+
+    for byte in _UINT64.pack(seed) + _stable_key_bytes(key):
+        hashed = ((hashed ^ byte) * _FNV_PRIME) & _MASK_64
+
+    return hashed
+
+
+
 class HashEntry():
     """Class to represent the key, value pair stored in a hash table
     """
@@ -36,7 +158,10 @@ class HashTable():
     """Class to represent a hash table object
     """
 
-    def __init__(self, num_elements):
+    def __init__(self, num_elements, max_load_factor=0.75,
+                 min_load_factor=None, resizing_factor=2,
+                 incremental_rehash=False, rehash_step=1,
+                 hash_function=hash, bloom_false_positive_rate=None):
 
         """Initialise Hash Table by creating array of length num_elements, with
         each element being a linked list
@@ -44,27 +169,149 @@ class HashTable():
         Parameters
         ----------
         num_elements : int
-            Size of array that stores linked lists
+            Initial size of array that stores linked lists
+        max_load_factor : float, optional
+            Maximum ratio of stored entries to array size; main_array is grown
+            by resizing_factor when an insert takes the load factor above this
+            value. None disables growing.
+        min_load_factor : float, optional
+            Minimum ratio of stored entries to array size; main_array is shrunk
+            by resizing_factor (never below num_elements) when the load factor
+            drops below this value. None (default) disables shrinking.
+        resizing_factor : int, optional
+            Factor by which to multiply/divide main_array length when resizing
+        incremental_rehash : bool, optional
+            If True, resizing keeps the old array alive alongside the new
+            main_array and migrates its linked lists a few at a time on each
+            insert/retrieve, rather than rehashing every entry at once
+        rehash_step : int, optional
+            Number of non-empty linked lists migrated per insert/retrieve while
+            an incremental rehash is in progress
+        hash_function : function, optional
+            Maps a key to an integer. Python's built-in hash() by default; use
+            fnv1a_hash for a hash that is the same in every Python process
+        bloom_false_positive_rate : float, optional
+            If given, keep a BloomFilter of stored keys, with this target false
+            positive rate, so most lookups of missing keys fail without
+            walking a linked list. None (default) for no Bloom filter.
+            Requires max_load_factor above 1 (or None), since shorter linked
+            lists are quicker to walk than the filter is to check.
         """
+        if (bloom_false_positive_rate is not None and
+                max_load_factor is not None and max_load_factor <= 1):
+            raise ValueError(
+                'A Bloom filter needs max_load_factor greater than 1 (or '
+                'None), as shorter linked lists are quicker to walk'
+            )
 
         # Create array of linked lists
         self.main_array = [LinkedList() for i in range(num_elements)]
         self.num_elements = num_elements
 
-    def _key_hash(self, key):
+        # Number of key, value pairs currently stored in the hash table
+        self.size = 0
+
+        self.max_load_factor = max_load_factor
+        self.min_load_factor = min_load_factor
+        self.resizing_factor = resizing_factor
+
+        # Never shrink main_array below its initial (or reserved) length
+        self.min_num_elements = num_elements
+
+        self.incremental_rehash = incremental_rehash
+        self.rehash_step = rehash_step
+
+        # Array being drained during an incremental rehash (None otherwise),
+        # and index of the next linked list in it to migrate
+        self.old_array = None
+        self.rehash_index = 0
+
+        self.hash_function = hash_function
+
+        # Bloom filter of keys in main_array (and in old_array, during an
+        # incremental rehash, the Bloom filter from before the resize)
+        self.bloom_false_positive_rate = bloom_false_positive_rate
+        self.bloom_filter = None
+        self.old_bloom_filter = None
+        if bloom_false_positive_rate is not None:
+            self.bloom_filter = self._new_bloom_filter()
+
+    def _new_bloom_filter(self):
+        """Return empty BloomFilter sized for the number of entries main_array
+        can hold before it next grows, and at least twice the number of
+        entries stored
+
+        Returns
+        -------
+        BloomFilter
+            Bloom filter using this hash table's hash_function
+        """
+        capacity = len(self.main_array)
+        if self.max_load_factor is not None:
+            capacity = int(math.ceil(capacity * self.max_load_factor))
+
+        capacity = max(capacity, 2 * self.size)
+
+        return BloomFilter(
+            capacity, self.bloom_false_positive_rate, self.hash_function
+        )
+
+    def _check_bloom_filter_capacity(self):
+        """Rebuild Bloom filter from every stored key once more keys have
+        been added to it than it was sized for. Resizing main_array rebuilds
+        it too, but with no max_load_factor main_array never grows.
+        """
+        bloom_filter = self.bloom_filter
+
+        # Wait for any incremental rehash, which is already rebuilding it
+        if (bloom_filter is None or self.old_array is not None or
+                bloom_filter.num_added <= bloom_filter.capacity):
+            return
+
+        self.bloom_filter = self._new_bloom_filter()
+        for entry in self._iter_all_entries():
+            self.bloom_filter.add(entry.key)
+
+    def _definitely_absent(self, key):
+        """Return True if the Bloom filter shows key is definitely not stored;
+        False if it may be, or if there is no Bloom filter
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed)
+
+        Returns
+        -------
+        bool
+            Whether lookup of key can fail without walking a linked list
+        """
+        if self.bloom_filter is None or self.bloom_filter.contains(key):
+            return False
+
+        return (
+            self.old_bloom_filter is None or
+            not self.old_bloom_filter.contains(key)
+        )
+
+    def _key_hash(self, key, num_buckets=None):
         """"Hash function to map input key to an integer, which represents the
         index in the main_array that contains the linked list which contains
         the input key, value pair.
 
-        Built on top of python's built in hash() function. Note, for strings,
-        python's hash() function will hash to a different result each time the
-        python process is run, since it salts the input with a random string.
-        Results will be consistent within the same python process.
+        Built on top of hash_function, python's built in hash() function by
+        default. Note, for strings, python's hash() function will hash to a
+        different result each time the python process is run, since it salts
+        the input with a random string. Results will be consistent within the
+        same python process. Use fnv1a_hash for results that are consistent
+        across processes.
 
         Parameters
         ----------
         key
             Key in key value store. Can be any non-mutable data type
+        num_buckets : int, optional
+            Length of array to map onto; defaults to length of main_array
 
         Returns
         -------
@@ -72,15 +319,19 @@ class HashTable():
             Hashed key, representing an index in self.main_array
         """
 
-        # Hash key with Python's built-in hash function (returns and integer)
-        py_hashed_key = hash(key)
+        # Hash key with hash_function (returns an integer)
+        py_hashed_key = self.hash_function(key)
+
+        if num_buckets is None:
+            # Note: len() is O(1) constant time in Python
+            num_buckets = len(self.main_array)
 
         # Map to an index in main_array
-        # Note: len() is O(1) constant time in Python
-        return py_hashed_key % len(self.main_array)
+        return py_hashed_key % num_buckets
 
     def insert(self, key, value):
-        """Insert key, value pair into hash table
+        """Insert key, value pair into hash table, overwriting the value of
+        key if it is already present
 
         Parameters
         ----------
@@ -90,14 +341,353 @@ class HashTable():
             Can be any python object
         """
 
-        # Map key to an index in main_array
-        item_index = self._key_hash(key)
+        # Do a bounded amount of any pending migration work
+        self._rehash_step()
+
+        if self._definitely_absent(key):
+            # New key: no need to search for it
+            linked_list = self.main_array[self._key_hash(key)]
+        else:
+            # Find linked list key belongs in, and its node if already present
+            linked_list, previous_node, node = self._find(key)
+
+            # Key already present: overwrite its value in place
+            if node is not None:
+                node.data.value = value
+                return
 
         # Turn input key, value pair into a HashEntry object
         data = HashEntry(key, value)
 
         # Append key, value pair to end of appropriate linked list
-        self.main_array[item_index].append(data)
+        linked_list.append(data)
+        self.size += 1
+
+        if self.bloom_filter is not None:
+            self.bloom_filter.add(key)
+
+        # Grow main_array if it has become too full
+        self._check_load_factor()
+        self._check_bloom_filter_capacity()
+
+    def delete(self, key):
+        """Delete key, and its value, from hash table, raising a KeyError if
+        key not found
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed). Can be any non-mutable data
+            type
+        """
+        self._remove(key)
+
+    def pop(self, key, default=_NO_DEFAULT):
+        """Delete key from hash table, returning its value
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed). Can be any non-mutable data
+            type
+        default : optional
+            Value to return if key not found. If not given, a KeyError is
+            raised instead
+
+        Returns
+        -------
+        Value that corresponded to input key, or default
+        """
+        try:
+            return self._remove(key)
+        except KeyError:
+            if default is _NO_DEFAULT:
+                raise
+            return default
+
+    def _remove(self, key):
+        """Unlink key's node from its linked list, returning its value and
+        raising a KeyError if key not found
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed). Can be any non-mutable data
+            type
+
+        Returns
+        -------
+        Value that corresponded to input key
+        """
+
+        # Do a bounded amount of any pending migration work
+        self._rehash_step()
+
+        if self._definitely_absent(key):
+            raise KeyError('Key not found in hash table.')
+
+        linked_list, previous_node, node = self._find(key)
+
+        if node is None:
+            raise KeyError('Key not found in hash table.')
+
+        linked_list.remove_node(node, previous_node)
+        self.size -= 1
+
+        # Shrink main_array if it has become too empty
+        self._check_load_factor()
+
+        return node.data.value
+
+    def _find(self, key):
+        """Locate key's node, checking the not yet migrated part of the old
+        array first if an incremental rehash is in progress
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed). Can be any non-mutable data
+            type
+
+        Returns
+        -------
+        linked_list : LinkedList
+            LinkedList containing key; if key not found, the LinkedList in
+            main_array that key should be appended to
+        previous_node : Node or None
+            Node before key's node; None if key's node is the head
+        node : Node or None
+            Node whose data is key's HashEntry; None if key not found
+        """
+        if self.old_array is not None:
+            old_index = self._key_hash(key, len(self.old_array))
+            if old_index >= self.rehash_index:
+                linked_list = self.old_array[old_index]
+                previous_node, node = self._linked_list_find(linked_list, key)
+                if node is not None:
+                    return linked_list, previous_node, node
+
+        linked_list = self.main_array[self._key_hash(key)]
+        previous_node, node = self._linked_list_find(linked_list, key)
+
+        return linked_list, previous_node, node
+
+    def _linked_list_find(self, linked_list, key):
+        """Walk a linked list looking for the node containing key
+
+        Parameters
+        ----------
+        linked_list : LinkedList
+            LinkedList object in which to perform lookup
+        key
+            Key in key value store (un-hashed). Can be any non-mutable data
+            type
+
+        Returns
+        -------
+        previous_node : Node or None
+            Node before the one containing key (None if at head or not found)
+        current_node : Node or None
+            Node containing key; None if key not found
+        """
+        previous_node = None
+        current_node = linked_list.head
+
+        while current_node is not None:
+            if current_node.data.key == key:
+                return previous_node, current_node
+
+            previous_node = current_node
+            current_node = current_node.next_node
+
+        return None, None
+
+    def load_factor(self):
+        """Return ratio of stored entries to length of main_array
+
+        Returns
+        -------
+        float
+            Average number of entries per linked list
+        """
+        return self.size / len(self.main_array)
+
+    def _check_load_factor(self):
+        """Resize main_array if the load factor has moved outside of the range
+        set by max_load_factor and min_load_factor.
+        """
+        load_factor = self.load_factor()
+
+        # Too full: grow main_array
+        if (self.max_load_factor is not None and
+                load_factor > self.max_load_factor):
+            self._resize(self.resizing_factor * len(self.main_array))
+
+        # Too empty: shrink main_array, but not below min_num_elements
+        elif (self.min_load_factor is not None and
+                load_factor < self.min_load_factor and
+                len(self.main_array) > self.min_num_elements):
+            self._resize(max(
+                self.min_num_elements,
+                len(self.main_array) // self.resizing_factor
+            ))
+
+    def _resize(self, new_num_elements):
+        """Rehash every entry into a new main_array of length new_num_elements
+
+        Parameters
+        ----------
+        new_num_elements : int
+            Length of new main_array
+        """
+        # Only one migration can be in progress at once; complete it first
+        self._finish_rehash()
+
+        old_array = self.main_array
+
+        # Swap in new array first, so _key_hash maps onto new array length
+        self.main_array = [LinkedList() for i in range(new_num_elements)]
+        self.num_elements = new_num_elements
+
+        # Rebuild Bloom filter at new size as entries are migrated (dropping
+        # any deleted keys), keeping old one for entries yet to be migrated
+        if self.bloom_filter is not None:
+            if self.incremental_rehash:
+                self.old_bloom_filter = self.bloom_filter
+            self.bloom_filter = self._new_bloom_filter()
+
+        if self.incremental_rehash:
+            # Leave entries in old_array, to be moved over by _rehash_step
+            self.old_array = old_array
+            self.rehash_index = 0
+            return
+
+        # Move each entry over, preserving order within each linked list
+        for linked_list in old_array:
+            self._migrate_linked_list(linked_list)
+
+    def _migrate_linked_list(self, linked_list):
+        """Move every entry in a linked list from the old array into its
+        linked list in main_array, preserving order
+
+        Parameters
+        ----------
+        linked_list : LinkedList
+            LinkedList object from the array being replaced
+        """
+        for entry in self._iter_entries(linked_list):
+            self.main_array[self._key_hash(entry.key)].append(entry)
+
+            if self.bloom_filter is not None:
+                self.bloom_filter.add(entry.key)
+
+    def _rehash_step(self, num_buckets=None):
+        """Migrate up to num_buckets non-empty linked lists from old_array into
+        main_array, if an incremental rehash is in progress.
+
+        As in Redis' incremental dict rehashing, a bounded number of empty
+        linked lists (10 per non-empty one) may also be skipped over, so a
+        single step never scans a long run of empty buckets.
+
+        Parameters
+        ----------
+        num_buckets : int, optional
+            Number of non-empty linked lists to migrate; defaults to
+            rehash_step
+        """
+        if self.old_array is None:
+            return
+
+        if num_buckets is None:
+            num_buckets = self.rehash_step
+
+        empty_visits = 10 * num_buckets
+
+        while num_buckets > 0 and self.rehash_index < len(self.old_array):
+            linked_list = self.old_array[self.rehash_index]
+
+            if linked_list.head is None:
+                empty_visits -= 1
+                if empty_visits < 0:
+                    break
+            else:
+                self._migrate_linked_list(linked_list)
+                num_buckets -= 1
+
+            # Drop reference to migrated linked list
+            self.old_array[self.rehash_index] = None
+            self.rehash_index += 1
+
+        # Migration complete: release old array
+        if self.rehash_index == len(self.old_array):
+            self.old_array = None
+            self.old_bloom_filter = None
+            self.rehash_index = 0
+
+    def _finish_rehash(self):
+        """Complete any in-progress incremental rehash in one go
+        """
+        if self.old_array is not None:
+            self._rehash_step(len(self.old_array))
+
+    def is_rehashing(self):
+        """Return True if an incremental rehash is in progress
+        """
+        return self.old_array is not None
+
+    def rehash_progress(self):
+        """Return fraction of the old array that has been migrated into
+        main_array by an incremental rehash
+
+        Returns
+        -------
+        float
+            Between 0 and 1; 1.0 if no rehash is in progress
+        """
+        if self.old_array is None:
+            return 1.0
+
+        return self.rehash_index / len(self.old_array)
+
+    def reserve(self, n):
+        """Resize main_array up front so that n entries can be stored without
+        the load factor exceeding max_load_factor, avoiding repeated rehashing
+        during bulk loads. Never shrinks main_array.
+
+        Parameters
+        ----------
+        n : int
+            Number of entries to make room for
+        """
+        if self.max_load_factor is None:
+            required_length = n
+        else:
+            required_length = int(math.ceil(n / self.max_load_factor))
+
+        # Don't let min_load_factor undo the reservation
+        self.min_num_elements = max(self.min_num_elements, required_length)
+
+        if required_length > len(self.main_array):
+            self._resize(required_length)
+
+    def _iter_entries(self, linked_list):
+        """Yield each HashEntry stored in a linked list, from head to tail
+
+        Parameters
+        ----------
+        linked_list : LinkedList
+            LinkedList object to iterate over
+
+        Yields
+        ------
+        HashEntry
+            Each key, value pair in linked_list
+        """
+        current_node = linked_list.head
+
+        while current_node is not None:
+            yield current_node.data
+            current_node = current_node.next_node
 
     def _linked_list_lookup(self, linked_list, key):
         """Returns value corresponds to input key in a linked list, raising a
@@ -155,6 +745,25 @@ class HashTable():
         Value corresponding to input key. Can be any python object.
         """
 
+        # Do a bounded amount of any pending migration work
+        self._rehash_step()
+
+        # Fast path for most missing keys
+        if self._definitely_absent(key):
+            raise KeyError('Key not found in hash table.')
+
+        # Check old array first, unless key's linked list there has already
+        # been migrated
+        if self.old_array is not None:
+            old_index = self._key_hash(key, len(self.old_array))
+            if old_index >= self.rehash_index:
+                try:
+                    return self._linked_list_lookup(
+                        self.old_array[old_index], key
+                    )
+                except KeyError:
+                    pass
+
         # Map key to an index in main_array
         item_index = self._key_hash(key)
 
@@ -164,30 +773,1061 @@ class HashTable():
         # Lookup key in linked list, returning its value
         return self._linked_list_lookup(bucket, key)
 
-    def print_all(self):
-        """Print entire contents of hash table
+    def contains(self, key):
+        """Return True if key is stored in hash table, False if not
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed). Can be any non-mutable data
+            type
+
+        Returns
+        -------
+        bool
+            Whether key is present
         """
-        print(
-            """\nContents of hash table, with blank lines separating distinct
-            linked lists:""".replace('  ', ''))
+        # Fast path for most missing keys, avoiding raising a KeyError
+        if self._definitely_absent(key):
+            return False
 
-        for linked_list in self.main_array:
-            print(linked_list)
-            print('')
+        try:
+            self.retrieve(key)
+        except KeyError:
+            return False
 
+        return True
 
-if __name__ == '__main__':
+    def _bucket_indexes(self, keys):
+        """Hash a whole batch of keys up front, mapping each to the index of
+        its linked list in main_array
 
-    h = HashTable(10)
+        Parameters
+        ----------
+        keys : list
+            Keys in key value store (un-hashed)
 
-    h.insert(-88, 'minus eighty-eight')
-    h.insert(0, 'zero')
-    h.insert(7, 'seven')
-    h.insert(8, 'eight')
-    h.insert(10, 'ten')
-    h.insert(490, 'four hundred and ninety')
-    h.insert(99, 'ninety-nine')
-    print(h.retrieve(7))
-    print(h.retrieve(99))
+        Returns
+        -------
+        list of int
+            Index in main_array for each key, in the same order as keys
+        """
+        num_buckets = len(self.main_array)
+        hash_function = self.hash_function
 
-    h.print_all()
+        return [hash_function(key) % num_buckets for key in keys]
+
+    def _batch_buckets(self, keys):
+        """Group a batch of keys by the linked list they map to, so that each
+        linked list need only be walked once for the whole batch
+
+        Parameters
+        ----------
+        keys : list
+            Keys in key value store (un-hashed)
+
+        Yields
+        ------
+        item_index : int
+            Index in main_array
+        positions : list of int
+            Positions in keys of the keys mapping to item_index, in order
+        """
+        item_indexes = self._bucket_indexes(keys)
+        bucket_of = item_indexes.__getitem__
+
+        # Stable sort, so each bucket's positions stay in batch order
+        order = sorted(range(len(keys)), key=bucket_of)
+
+        for item_index, positions in itertools.groupby(order, key=bucket_of):
+            yield item_index, list(positions)
+
+    def _batch_rehash_step(self, batch_size):
+        """Do the migration work of batch_size single operations, returning
+        True if an incremental rehash is still in progress afterwards (in
+        which case keys may live in either array, so the batch falls back to
+        per-key operations)
+
+        Parameters
+        ----------
+        batch_size : int
+            Number of keys in batch
+
+        Returns
+        -------
+        bool
+            Whether an incremental rehash is still in progress
+        """
+        if self.old_array is not None:
+            self._rehash_step(batch_size * self.rehash_step)
+
+        return self.old_array is not None
+
+    def insert_many(self, pairs):
+        """Insert many key, value pairs into hash table, overwriting the values
+        of keys already present. Equivalent to calling insert on each pair in
+        order, but grows main_array at most once, hashes the whole batch up
+        front, and groups it by linked list, walking each one only once (so
+        without checking the Bloom filter, if any, for new keys).
+
+        Parameters
+        ----------
+        pairs : iterable of (key, value) tuples
+            Key, value pairs to insert; for repeated keys the last value wins
+        """
+        pairs = list(pairs)
+
+        if self._batch_rehash_step(len(pairs)):
+            for key, value in pairs:
+                self.insert(key, value)
+            return
+
+        # Grow main_array once, to fit the batch if every key is new
+        if self.max_load_factor is not None:
+            new_length = len(self.main_array)
+            while (self.size + len(pairs)) > self.max_load_factor * new_length:
+                new_length *= self.resizing_factor
+
+            if new_length > len(self.main_array):
+                self._resize(new_length)
+
+                # Resize has started an incremental rehash
+                if self.old_array is not None:
+                    for key, value in pairs:
+                        self.insert(key, value)
+                    return
+
+        main_array = self.main_array
+        bloom_filter = self.bloom_filter
+
+        for item_index, positions in self._batch_buckets(
+                [key for key, value in pairs]):
+            linked_list = main_array[item_index]
+
+            # Usual case of one key per linked list: plain walk, overwriting
+            # key's value if present, otherwise appending a new entry
+            if len(positions) == 1:
+                key, value = pairs[positions[0]]
+                current_node = linked_list.head
+                while current_node is not None:
+                    if current_node.data.key == key:
+                        current_node.data.value = value
+                        break
+                    current_node = current_node.next_node
+                else:
+                    linked_list.append(HashEntry(key, value))
+                    self.size += 1
+
+                    if bloom_filter is not None:
+                        bloom_filter.add(key)
+                continue
+
+            # Batch's keys for this linked list, mapped to their last value
+            # (in order of first appearance, like repeated inserts)
+            pending = {}
+            for position in positions:
+                key, value = pairs[position]
+                pending[key] = value
+
+            # Walk linked list once, overwriting values of keys present
+            current_node = linked_list.head
+            while current_node is not None and pending:
+                entry = current_node.data
+                if entry.key in pending:
+                    entry.value = pending.pop(entry.key)
+                current_node = current_node.next_node
+
+            # Keys not present: append new entries
+            for key, value in pending.items():
+                linked_list.append(HashEntry(key, value))
+                self.size += 1
+
+                if bloom_filter is not None:
+                    bloom_filter.add(key)
+
+        self._check_load_factor()
+        self._check_bloom_filter_capacity()
+
+    def retrieve_many(self, keys, default=_NO_DEFAULT):
+        """Retrieve values for many keys from hash table. Equivalent to calling
+        retrieve on each key, but hashes the whole batch up front and groups
+        it by linked list, walking each one only once. The Bloom filter (if
+        any) is not checked, as each linked list is only walked once anyway.
+
+        Parameters
+        ----------
+        keys : iterable
+            Keys in key value store (un-hashed)
+        default : optional
+            Value to return for keys not found. If not given, a KeyError is
+            raised if any key is not found
+
+        Returns
+        -------
+        list
+            Values corresponding to keys, in the same order as keys
+        """
+        keys = list(keys)
+
+        if self._batch_rehash_step(len(keys)):
+            if default is _NO_DEFAULT:
+                return [self.retrieve(key) for key in keys]
+            return [self._retrieve_or_default(key, default) for key in keys]
+
+        main_array = self.main_array
+        results = [default] * len(keys)
+
+        for item_index, positions in self._batch_buckets(keys):
+
+            # Usual case of one key per linked list: plain walk, stopping at
+            # key
+            if len(positions) == 1:
+                position = positions[0]
+                key = keys[position]
+                current_node = main_array[item_index].head
+                while current_node is not None:
+                    if current_node.data.key == key:
+                        results[position] = current_node.data.value
+                        break
+                    current_node = current_node.next_node
+                else:
+                    if default is _NO_DEFAULT:
+                        raise KeyError('Key not found in hash table.')
+                continue
+
+            # Map each key to look up in this linked list to its positions in
+            # keys
+            wanted = {}
+            for position in positions:
+                wanted.setdefault(keys[position], []).append(position)
+
+            # Walk linked list once, until every wanted key has been found or
+            # end is reached
+            num_found = 0
+            current_node = main_array[item_index].head
+            while current_node is not None and wanted:
+                entry = current_node.data
+                found_positions = wanted.pop(entry.key, None)
+                if found_positions is not None:
+                    for position in found_positions:
+                        results[position] = entry.value
+                    num_found += len(found_positions)
+                current_node = current_node.next_node
+
+            # Some keys not found
+            if default is _NO_DEFAULT and num_found < len(positions):
+                raise KeyError('Key not found in hash table.')
+
+        return results
+
+    def _retrieve_or_default(self, key, default):
+        """Retrieve value for key, returning default if key not found
+        """
+        try:
+            return self.retrieve(key)
+        except KeyError:
+            return default
+
+    def contains_many(self, keys):
+        """Check whether each of many keys is stored in hash table, using
+        retrieve_many (walking each affected linked list only once)
+
+        Parameters
+        ----------
+        keys : iterable
+            Keys in key value store (un-hashed)
+
+        Returns
+        -------
+        list of bool
+            Whether each key is present, in the same order as keys
+        """
+        missing = object()
+
+        return [
+            value is not missing
+            for value in self.retrieve_many(keys, default=missing)
+        ]
+
+    def _iter_all_entries(self):
+        """Yield every HashEntry in the hash table, including those not yet
+        migrated by an incremental rehash
+
+        Yields
+        ------
+        HashEntry
+            Each key, value pair in hash table
+        """
+        for linked_list in self.main_array:
+            yield from self._iter_entries(linked_list)
+
+        if self.old_array is not None:
+            for linked_list in self.old_array[self.rehash_index:]:
+                yield from self._iter_entries(linked_list)
+
+    def items(self):
+        """Iterate over all key, value pairs in hash table, in no particular
+        order. Hash table must not be modified during iteration.
+
+        Yields
+        ------
+        tuple
+            (key, value) for each entry
+        """
+        for entry in self._iter_all_entries():
+            yield entry.key, entry.value
+
+    def save(self, path, seed=0):
+        """Save hash table to a flat, read-only file that can be opened with
+        HashTable.open_mmap, in this or any other Python process.
+
+        The file is laid out using fnv1a_hash with the given seed, whatever
+        this table's own hash_function. Keys must be supported by fnv1a_hash,
+        and keys and values must be picklable.
+
+        Parameters
+        ----------
+        path : str
+            Path to file to write
+        seed : int, optional
+            Seed passed to fnv1a_hash
+        """
+        num_buckets = max(1, self.size)
+
+        # Pickle entries, grouping them by bucket
+        buckets = [[] for i in range(num_buckets)]
+        for entry in self._iter_all_entries():
+            hashed_key = fnv1a_hash(entry.key, seed)
+            buckets[hashed_key % num_buckets].append((
+                hashed_key, pickle.dumps(entry.key), pickle.dumps(entry.value)
+            ))
+
+        # Records start after header, bucket start and entry offset tables
+        record_offset = (
+            _SNAPSHOT_HEADER.size + (num_buckets + 1 + self.size) * _UINT64.size
+        )
+
+        bucket_starts = [0]
+        entry_offsets = []
+        for bucket in buckets:
+            for hashed_key, key_bytes, value_bytes in bucket:
+                entry_offsets.append(record_offset)
+                record_offset += (
+                    _SNAPSHOT_RECORD.size + len(key_bytes) + len(value_bytes)
+                )
+            bucket_starts.append(len(entry_offsets))
+
+        with open(path, 'wb') as snapshot_file:
+            snapshot_file.write(_SNAPSHOT_HEADER.pack(
+                _SNAPSHOT_MAGIC, num_buckets, self.size, seed
+            ))
+            snapshot_file.write(struct.pack(
+                '<{}Q'.format(len(bucket_starts)), *bucket_starts
+            ))
+            snapshot_file.write(struct.pack(
+                '<{}Q'.format(len(entry_offsets)), *entry_offsets
+            ))
+            for bucket in buckets:
+                for hashed_key, key_bytes, value_bytes in bucket:
+                    snapshot_file.write(_SNAPSHOT_RECORD.pack(
+                        hashed_key, len(key_bytes), len(value_bytes)
+                    ))
+                    snapshot_file.write(key_bytes)
+                    snapshot_file.write(value_bytes)
+
+    @staticmethod
+    def open_mmap(path):
+        """Open a file written by HashTable.save as a read-only, memory mapped
+        hash table
+
+        Parameters
+        ----------
+        path : str
+            Path to file
+
+        Returns
+        -------
+        MappedHashTable
+            Read-only hash table, with retrieve and contains methods
+        """
+        return MappedHashTable(path)
+
+    def stats(self):
+        """Return statistics on how entries are spread across linked lists,
+        to help diagnose slow lookups.
+
+        Probe counts are the expected number of nodes visited by retrieve,
+        assuming every stored key (for successful lookups) or every linked
+        list (for failed lookups) is equally likely to be looked up.
+
+        Returns
+        -------
+        dict
+            size : number of stored entries
+            num_buckets : number of linked lists (in both arrays, during an
+                incremental rehash)
+            load_factor : entries per linked list in main_array
+            chain_length_histogram : dict, mapping chain length to number
+                of linked lists of that length, in ascending length order
+            longest_chain : length of longest linked list
+            avg_probes_successful : mean nodes visited finding a stored key
+            avg_probes_failed : mean nodes visited before raising KeyError
+        """
+        linked_lists = list(self.main_array)
+        if self.old_array is not None:
+            linked_lists.extend(self.old_array[self.rehash_index:])
+
+        chain_length_counts = {}
+        total_successful_probes = 0
+
+        for linked_list in linked_lists:
+            chain_length = 0
+            current_node = linked_list.head
+            while current_node is not None:
+                chain_length += 1
+                current_node = current_node.next_node
+
+            chain_length_counts[chain_length] = (
+                chain_length_counts.get(chain_length, 0) + 1
+            )
+
+            # Finding the i-th entry of a linked list visits i nodes
+            total_successful_probes += chain_length * (chain_length + 1) // 2
+
+        return {
+            'size': self.size,
+            'num_buckets': len(linked_lists),
+            'load_factor': self.load_factor(),
+            'chain_length_histogram': {
+                chain_length: chain_length_counts[chain_length]
+                for chain_length in sorted(chain_length_counts)
+            },
+            'longest_chain': max(chain_length_counts),
+            'avg_probes_successful': (
+                total_successful_probes / self.size if self.size else 0.0
+            ),
+            'avg_probes_failed': self.size / len(linked_lists),
+        }
+
+    def enable_instrumentation(self, hook=None):
+        """Start counting and timing calls to this hash table's public
+        operations.
+
+        Works by shadowing each operation with a wrapped version on this
+        instance only, so tables without instrumentation enabled run the
+        unmodified methods and pay no overhead. Operations that call other
+        public operations (e.g. contains calls retrieve) count both.
+
+        Parameters
+        ----------
+        hook : function, optional
+            Called as hook(operation_name, duration_in_seconds) after every
+            instrumented call, e.g. to export to a metrics pipeline
+        """
+        self.disable_instrumentation()
+
+        self.operation_counts = {name: 0 for name in _INSTRUMENTED_OPERATIONS}
+        self.operation_times = {
+            name: 0.0 for name in _INSTRUMENTED_OPERATIONS
+        }
+
+        for name in _INSTRUMENTED_OPERATIONS:
+            setattr(self, name, self._instrumented(name, hook))
+
+    def _instrumented(self, name, hook):
+        """Return a version of the bound method called name that records its
+        call count and time taken
+        """
+        method = getattr(type(self), name).__get__(self)
+        counts = self.operation_counts
+        times = self.operation_times
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                counts[name] += 1
+                times[name] += duration
+                if hook is not None:
+                    hook(name, duration)
+
+        return wrapper
+
+    def disable_instrumentation(self):
+        """Stop counting and timing operations, restoring the unwrapped
+        methods. Counts and times collected so far are kept.
+        """
+        for name in _INSTRUMENTED_OPERATIONS:
+            self.__dict__.pop(name, None)
+
+    def print_all(self):
+        """Print entire contents of hash table
+        """
+        print(
+            """\nContents of hash table, with blank lines separating distinct
+            linked lists:""".replace('  ', ''))
+
+        for linked_list in self.main_array:
+            print(linked_list)
+            print('')
+
+        # Include entries not yet migrated by an incremental rehash
+        if self.old_array is not None:
+            print('Not yet rehashed:\n')
+            for linked_list in self.old_array[self.rehash_index:]:
+                print(linked_list)
+                print('')
+
+
+class OpenAddressingHashTable():
+    """Class to represent a hash table object that uses open addressing
+    (linear probing), as an alternative to HashTable's linked lists.
+
+    Hashes, keys and values are stored in three flat parallel lists, so a
+    lookup compares integers in one list rather than following a chain of
+    Node and HashEntry objects. Deleted slots are marked with a tombstone,
+    which lookups probe past and inserts may reuse.
+    """
+
+    def __init__(self, num_elements=8, max_load_factor=2 / 3):
+        """Initialise Hash Table by creating empty hash, key and value arrays
+
+        Parameters
+        ----------
+        num_elements : int, optional
+            Initial number of slots; rounded up to a power of 2
+        max_load_factor : float, optional
+            Maximum ratio of occupied slots (including tombstones) to total
+            slots, above which arrays are doubled in length and rehashed.
+            Must be between 0 and 1 (exclusive), so that probing always
+            reaches an empty slot
+        """
+        if not 0 < max_load_factor < 1:
+            raise ValueError('max_load_factor must be between 0 and 1')
+
+        self.max_load_factor = max_load_factor
+
+        # Number of live key, value pairs, and number of tombstones
+        self.size = 0
+        self.num_tombstones = 0
+
+        self._allocate(self._round_up_capacity(num_elements))
+
+    def _round_up_capacity(self, num_elements):
+        """Return smallest power of 2 that is at least num_elements (min 8)
+        """
+        capacity = 8
+        while capacity < num_elements:
+            capacity *= 2
+        return capacity
+
+    def _allocate(self, capacity):
+        """Replace hash, key and value arrays with empty arrays of length
+        capacity
+
+        Parameters
+        ----------
+        capacity : int
+            Number of slots; must be a power of 2
+        """
+        self.hash_array = [None] * capacity
+        self.key_array = [_EMPTY] * capacity
+        self.value_array = [None] * capacity
+        self.num_elements = capacity
+
+        # Number of bits in slot index, used by _key_hash
+        self._index_bits = capacity.bit_length() - 1
+
+    def _key_hash(self, key):
+        """Return Python hash of key, and index of the slot where probing for
+        key begins.
+
+        Python's hash() of an int is the int itself, so the hash is scrambled
+        with a multiplicative (Fibonacci) hash before taking the top bits;
+        otherwise runs of similar keys would form long probe sequences.
+
+        Parameters
+        ----------
+        key
+            Key in key value store. Can be any non-mutable data type
+
+        Returns
+        -------
+        py_hashed_key : int
+            Result of hash(key)
+        int
+            Index in hash, key and value arrays to start probing from
+        """
+        py_hashed_key = hash(key)
+
+        scrambled = (py_hashed_key * _FIBONACCI_MULTIPLIER) & _MASK_64
+
+        return py_hashed_key, scrambled >> (64 - self._index_bits)
+
+    def _find_slot(self, key, py_hashed_key, index):
+        """Probe from index for key, returning the index of the slot holding
+        key, or -1 if key is not present
+
+        Parameters
+        ----------
+        key
+            Key to search for
+        py_hashed_key : int
+            Result of hash(key)
+        index : int
+            Slot to start probing from
+
+        Returns
+        -------
+        int
+            Index of slot containing key, or -1
+        """
+        mask = self.num_elements - 1
+        hash_array = self.hash_array
+        key_array = self.key_array
+
+        # Probe until an empty slot is reached; there is always at least one,
+        # since max_load_factor < 1. Tombstones have hash None, so are skipped
+        while key_array[index] is not _EMPTY:
+            if (hash_array[index] == py_hashed_key and
+                    key_array[index] == key):
+                return index
+            index = (index + 1) & mask
+
+        return -1
+
+    def insert(self, key, value):
+        """Insert key, value pair into hash table, overwriting the value of
+        key if it is already present
+
+        Parameters
+        ----------
+        key
+            Key in key value store. Can be any non-mutable data type
+        value
+            Can be any python object
+        """
+        py_hashed_key, index = self._key_hash(key)
+        mask = self.num_elements - 1
+
+        # Remember first tombstone passed, to reuse for a new key
+        first_tombstone = -1
+
+        while self.key_array[index] is not _EMPTY:
+            if self.key_array[index] is _TOMBSTONE:
+                if first_tombstone == -1:
+                    first_tombstone = index
+            elif (self.hash_array[index] == py_hashed_key and
+                    self.key_array[index] == key):
+                # Key already present: overwrite value
+                self.value_array[index] = value
+                return
+            index = (index + 1) & mask
+
+        if first_tombstone != -1:
+            index = first_tombstone
+            self.num_tombstones -= 1
+
+        self.hash_array[index] = py_hashed_key
+        self.key_array[index] = key
+        self.value_array[index] = value
+        self.size += 1
+
+        # Rehash if arrays have become too full, sizing new arrays for live
+        # entries only: doubles their length if there are few tombstones
+        if (self.size + self.num_tombstones >
+                self.max_load_factor * self.num_elements):
+            self._resize(self._round_up_capacity(
+                int(self.size / self.max_load_factor) + 1
+            ))
+
+    def retrieve(self, key):
+        """Retrieve a value from the hash table based on its key
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed). Can be any non-mutable data
+            type
+
+        Returns
+        -------
+        Value corresponding to input key. Can be any python object.
+        """
+        index = self._find_slot(key, *self._key_hash(key))
+
+        if index == -1:
+            raise KeyError('Key not found in hash table.')
+
+        return self.value_array[index]
+
+    def delete(self, key):
+        """Delete key, and its value, from hash table, leaving a tombstone in
+        its slot. Raises KeyError if key is not present.
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed). Can be any non-mutable data
+            type
+        """
+        index = self._find_slot(key, *self._key_hash(key))
+
+        if index == -1:
+            raise KeyError('Key not found in hash table.')
+
+        self.hash_array[index] = None
+        self.key_array[index] = _TOMBSTONE
+        self.value_array[index] = None
+        self.size -= 1
+        self.num_tombstones += 1
+
+    def pop(self, key, default=_NO_DEFAULT):
+        """Delete key from hash table, returning its value
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed). Can be any non-mutable data
+            type
+        default : optional
+            Value to return if key not found. If not given, a KeyError is
+            raised instead
+
+        Returns
+        -------
+        Value that corresponded to input key, or default
+        """
+        index = self._find_slot(key, *self._key_hash(key))
+
+        if index == -1:
+            if default is _NO_DEFAULT:
+                raise KeyError('Key not found in hash table.')
+            return default
+
+        value = self.value_array[index]
+        self.delete(key)
+
+        return value
+
+    def load_factor(self):
+        """Return ratio of live entries to number of slots
+
+        Returns
+        -------
+        float
+            Fraction of slots holding a key, value pair
+        """
+        return self.size / self.num_elements
+
+    def _resize(self, capacity):
+        """Rehash every live entry into new arrays of length capacity,
+        discarding tombstones
+
+        Parameters
+        ----------
+        capacity : int
+            Number of slots in new arrays; must be a power of 2
+        """
+        old_hashes = self.hash_array
+        old_keys = self.key_array
+        old_values = self.value_array
+
+        self._allocate(capacity)
+        self.num_tombstones = 0
+        mask = capacity - 1
+
+        for py_hashed_key, key, value in zip(old_hashes, old_keys, old_values):
+            if key is _EMPTY or key is _TOMBSTONE:
+                continue
+
+            # Keys are known to be distinct, so just find first empty slot
+            scrambled = (py_hashed_key * _FIBONACCI_MULTIPLIER) & _MASK_64
+            index = scrambled >> (64 - self._index_bits)
+            while self.key_array[index] is not _EMPTY:
+                index = (index + 1) & mask
+
+            self.hash_array[index] = py_hashed_key
+            self.key_array[index] = key
+            self.value_array[index] = value
+
+    def reserve(self, n):
+        """Resize arrays up front so that n entries can be stored without
+        exceeding max_load_factor. Never shrinks arrays.
+
+        Parameters
+        ----------
+        n : int
+            Number of entries to make room for
+        """
+        capacity = self._round_up_capacity(
+            int(math.ceil(n / self.max_load_factor)) + 1
+        )
+
+        if capacity > self.num_elements:
+            self._resize(capacity)
+
+    def print_all(self):
+        """Print entire contents of hash table, one slot per line
+        """
+        print('\nContents of hash table, one line per occupied slot:')
+
+        for index, key in enumerate(self.key_array):
+            if key is _EMPTY or key is _TOMBSTONE:
+                continue
+            print('{}: {}'.format(
+                index, HashEntry(key, self.value_array[index])
+            ))
+
+
+class MappedHashTable():
+    """Class to represent a read-only hash table, stored in a file written by
+    HashTable.save and accessed through a memory map.
+
+    Lookups read straight from the mapped file, so opening a table of any
+    size is near instant, and many processes opening the same file share one
+    copy of it through the operating system's page cache.
+
+    File layout (all integers little-endian, unsigned 64-bit unless noted):
+    header (magic bytes, num_buckets, num_entries, seed); num_buckets + 1
+    bucket start positions in the entry offset table; num_entries file
+    offsets of entry records; entry records, each consisting of the key's
+    fnv1a_hash, key length and value length (32-bit), then the pickled key
+    and pickled value. Entries are stored grouped by bucket.
+
+    Keys and values are unpickled when read, so only open files from a
+    trusted source.
+    """
+
+    def __init__(self, path):
+        """Open and memory map a file written by HashTable.save
+
+        Parameters
+        ----------
+        path : str
+            Path to file
+        """
+        self.file = open(path, 'rb')
+        self.mapped_file = mmap.mmap(
+            self.file.fileno(), 0, access=mmap.ACCESS_READ
+        )
+
+        magic, self.num_elements, self.size, self.seed = (
+            _SNAPSHOT_HEADER.unpack_from(self.mapped_file, 0)
+        )
+        if magic != _SNAPSHOT_MAGIC:
+            self.close()
+            raise ValueError('{} is not a HashTable snapshot'.format(path))
+
+        # Positions of bucket start and entry offset tables within the file
+        self._bucket_starts_offset = _SNAPSHOT_HEADER.size
+        self._entry_offsets_offset = (
+            self._bucket_starts_offset +
+            (self.num_elements + 1) * _UINT64.size
+        )
+
+    def _find_record(self, key):
+        """Return file offset of key's entry record, or -1 if not found
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed)
+
+        Returns
+        -------
+        int
+            Offset of record within file
+        """
+        mapped_file = self.mapped_file
+        hashed_key = fnv1a_hash(key, self.seed)
+        item_index = hashed_key % self.num_elements
+
+        # Range of this bucket's entries in the entry offset table
+        bucket_start_position = (
+            self._bucket_starts_offset + item_index * _UINT64.size
+        )
+        first_entry = _UINT64.unpack_from(mapped_file, bucket_start_position)[0]
+        end_entry = _UINT64.unpack_from(
+            mapped_file, bucket_start_position + _UINT64.size
+        )[0]
+
+        for entry in range(first_entry, end_entry):
+            record_offset = _UINT64.unpack_from(
+                mapped_file,
+                self._entry_offsets_offset + entry * _UINT64.size
+            )[0]
+            record_hash, key_length, value_length = (
+                _SNAPSHOT_RECORD.unpack_from(mapped_file, record_offset)
+            )
+
+            # Only unpickle key if its full hash matches
+            if record_hash == hashed_key:
+                key_offset = record_offset + _SNAPSHOT_RECORD.size
+                stored_key = pickle.loads(
+                    mapped_file[key_offset:key_offset + key_length]
+                )
+                if stored_key == key:
+                    return record_offset
+
+        return -1
+
+    def retrieve(self, key):
+        """Retrieve a value from the hash table based on its key
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed)
+
+        Returns
+        -------
+        Value corresponding to input key. Can be any picklable python object.
+        """
+        record_offset = self._find_record(key)
+
+        if record_offset == -1:
+            raise KeyError('Key not found in hash table.')
+
+        _, key_length, value_length = _SNAPSHOT_RECORD.unpack_from(
+            self.mapped_file, record_offset
+        )
+        value_offset = record_offset + _SNAPSHOT_RECORD.size + key_length
+
+        return pickle.loads(
+            self.mapped_file[value_offset:value_offset + value_length]
+        )
+
+    def contains(self, key):
+        """Return True if key is stored in hash table, False if not
+        """
+        return self._find_record(key) != -1
+
+    def close(self):
+        """Unmap and close underlying file
+        """
+        self.mapped_file.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == '__main__':
+
+    h = HashTable(10)
+
+    h.insert(-88, 'minus eighty-eight')
+    h.insert(0, 'zero')
+    h.insert(7, 'seven')
+    h.insert(8, 'eight')
+    h.insert(10, 'ten')
+    h.insert(490, 'four hundred and ninety')
+    h.insert(99, 'ninety-nine')
+    print(h.retrieve(7))
+    print(h.retrieve(99))
+
+    # Inserting an existing key overwrites its value
+    h.insert(7, 'SEVEN')
+    print(h.retrieve(7))
+    print(h.pop(8), h.pop(8, 'eight already deleted'))
+    h.delete(10)
+
+    # Save to disk, then look up values straight from a memory mapped file
+    snapshot_path = os.path.join(tempfile.mkdtemp(), 'hash_table.snapshot')
+    h.save(snapshot_path)
+    with HashTable.open_mmap(snapshot_path) as mapped:
+        print(mapped.retrieve(7), mapped.contains(8))
+
+    # Diagnose key distribution, and count operations
+    print(h.stats())
+    h.enable_instrumentation()
+    h.retrieve(7)
+    h.contains(1234)
+    h.disable_instrumentation()
+    print(h.operation_counts)
+
+    # Same bucket layout in every Python process
+    h_stable = HashTable(10, hash_function=fnv1a_hash)
+    h_stable.insert('stable', 'key')
+    print(fnv1a_hash('stable'), h_stable._key_hash('stable'))
+
+    h.print_all()
+
+    # Table grows automatically as entries are added
+    h = HashTable(2)
+    for i in range(100):
+        h.insert(i, i ** 2)
+    print('\nentries:', h.size, ' buckets:', h.num_elements,
+          ' load factor:', h.load_factor())
+
+    # Incremental rehashing spreads each resize over later operations
+    h = HashTable(2, incremental_rehash=True, rehash_step=1)
+    for i in range(100):
+        h.insert(i, i ** 2)
+        if h.is_rehashing() and i % 10 == 0:
+            print('insert {}: rehash progress {:.0%}'.format(
+                i, h.rehash_progress()
+            ))
+    print(h.retrieve(99))
+
+    # Compare both engines on the same workload
+    num_keys = 200000
+    keys = ['key{}'.format(i) for i in range(num_keys)]
+
+    for table_class in (HashTable, OpenAddressingHashTable):
+        tracemalloc.start()
+        table = table_class(8)
+        start = time.perf_counter()
+        for i, key in enumerate(keys):
+            table.insert(key, i)
+        insert_time = time.perf_counter() - start
+        memory_used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        for key in keys:
+            table.retrieve(key)
+        retrieve_time = time.perf_counter() - start
+
+        print(
+            '{}: insert {:.3f}s, retrieve {:.3f}s, {:.1f} MB for {} keys'
+            .format(
+                table_class.__name__, insert_time, retrieve_time,
+                memory_used / 1e6, num_keys
+            )
+        )
+
+    # Compare batched and per-key operations on the same workload
+    pairs = [(key, i) for i, key in enumerate(keys)]
+
+    table = HashTable(8)
+    start = time.perf_counter()
+    for key, value in pairs:
+        table.insert(key, value)
+    loop_insert_time = time.perf_counter() - start
+    start = time.perf_counter()
+    loop_values = [table.retrieve(key) for key in keys]
+    loop_retrieve_time = time.perf_counter() - start
+
+    table = HashTable(8)
+    start = time.perf_counter()
+    table.insert_many(pairs)
+    batch_insert_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batch_values = table.retrieve_many(keys)
+    batch_retrieve_time = time.perf_counter() - start
+
+    assert loop_values == batch_values
+    print('per-key loop: insert {:.3f}s, retrieve {:.3f}s'.format(
+        loop_insert_time, loop_retrieve_time
+    ))
+    print('batched:      insert {:.3f}s, retrieve {:.3f}s'.format(
+        batch_insert_time, batch_retrieve_time
+    ))
@@ -0,0 +1,375 @@
+import math
+import struct
+import time
+import tracemalloc
+from array import array
+
+from data_structures.arrays_and_strings.bloom_filter import _mix64
+
+
+# Key values marking never-used and deleted slots in the key array. Entries
+# with these keys are stored separately, in special_entries
+_EMPTY_KEY = -2 ** 63
+_TOMBSTONE_KEY = -2 ** 63 + 1
+
+
+class IntHashTable():
+    """Class to represent a hash table object specialised for 64-bit integer
+    keys.
+
+    Keys are stored unboxed in an array('q'), and values either in an
+    array('d')/array('q') (if value_typecode is given) or a list. Collisions
+    are resolved by open addressing with linear probing, starting from a
+    slot chosen by an integer mixing hash, with empty and deleted slots
+    marked by reserved key values. With numeric values this costs 16 bytes
+    per slot, so about 18 bytes per entry for a table sized with reserve
+    (any number of slots is allowed, not just powers of 2).
+
+    The underlying arrays can be exported without copying through the buffer
+    protocol, with key_buffer and value_buffer.
+    """
+
+    def __init__(self, num_elements=8, value_typecode=None,
+                 max_load_factor=0.875):
+        """Initialise empty hash table
+
+        Parameters
+        ----------
+        num_elements : int, optional
+            Initial number of slots (at least 8)
+        value_typecode : str, optional
+            array module typecode to store values in (e.g. 'd' for floats,
+            'q' for integers); None (default) to store any python object in
+            a list
+        max_load_factor : float, optional
+            Maximum ratio of occupied slots (including deleted ones) to total
+            slots, above which arrays are doubled in length and rehashed
+        """
+        self.value_typecode = value_typecode
+        self.max_load_factor = max_load_factor
+
+        self.size = 0
+        self.num_tombstones = 0
+
+        # [key, value] pairs for the two reserved key values
+        self.special_entries = []
+
+        self._allocate(max(8, num_elements))
+
+    def _allocate(self, capacity):
+        """Replace key and value arrays with empty arrays of length capacity
+
+        Parameters
+        ----------
+        capacity : int
+            Number of slots
+        """
+        self.key_array = array('q', [_EMPTY_KEY]) * capacity
+
+        if self.value_typecode is None:
+            self.value_array = [None] * capacity
+        else:
+            self.value_array = array(self.value_typecode, [0]) * capacity
+
+        self.num_elements = capacity
+
+    def _key_hash(self, key):
+        """Map integer key to the slot where probing for it begins
+
+        Parameters
+        ----------
+        key : int
+            Key in key value store
+
+        Returns
+        -------
+        int
+            Index in key and value arrays
+        """
+        # Scale 64-bit hash down to number of slots, without a division
+        return (_mix64(key) * self.num_elements) >> 64
+
+    def _find_slot(self, key):
+        """Return index of the slot holding key, or -1 if key is not present
+        """
+        key_array = self.key_array
+        capacity = self.num_elements
+        index = self._key_hash(key)
+
+        while True:
+            stored_key = key_array[index]
+            if stored_key == key:
+                return index
+            if stored_key == _EMPTY_KEY:
+                return -1
+            index += 1
+            if index == capacity:
+                index = 0
+
+    def _find_special_index(self, key):
+        """Return index in special_entries of key's pair, or -1
+        """
+        for special_index, (stored_key, value) in enumerate(
+                self.special_entries):
+            if stored_key == key:
+                return special_index
+
+        return -1
+
+    def insert(self, key, value):
+        """Insert key, value pair into hash table, overwriting the value of
+        key if it is already present
+
+        Parameters
+        ----------
+        key : int
+            Key in key value store; must fit in a signed 64-bit integer
+        value
+            Can be any python object, or a number if value_typecode was given
+        """
+        if key == _EMPTY_KEY or key == _TOMBSTONE_KEY:
+            special_index = self._find_special_index(key)
+            if special_index == -1:
+                self.special_entries.append([key, value])
+                self.size += 1
+            else:
+                self.special_entries[special_index][1] = value
+            return
+
+        key_array = self.key_array
+        capacity = self.num_elements
+        index = self._key_hash(key)
+
+        # Remember first deleted slot passed, to reuse for a new key
+        first_tombstone = -1
+
+        while True:
+            stored_key = key_array[index]
+            if stored_key == key:
+                # Key already present: overwrite value
+                self.value_array[index] = value
+                return
+            if stored_key == _EMPTY_KEY:
+                break
+            if stored_key == _TOMBSTONE_KEY and first_tombstone == -1:
+                first_tombstone = index
+            index += 1
+            if index == capacity:
+                index = 0
+
+        if first_tombstone != -1:
+            index = first_tombstone
+
+        # Write value before key, and update counts last, so a value that
+        # doesn't fit value_typecode (TypeError) or a key too large for 64
+        # bits (OverflowError) leaves the table unchanged
+        self.value_array[index] = value
+        key_array[index] = key
+
+        if first_tombstone != -1:
+            self.num_tombstones -= 1
+        self.size += 1
+
+        # Rehash if arrays have become too full, sizing new arrays for live
+        # entries only: doubles their length if there are few tombstones
+        if (self.size + self.num_tombstones >
+                self.max_load_factor * self.num_elements):
+            self._resize(max(8, int(2 * self.size / self.max_load_factor)))
+
+    def retrieve(self, key):
+        """Retrieve a value from the hash table based on its key
+
+        Parameters
+        ----------
+        key : int
+            Key in key value store
+
+        Returns
+        -------
+        Value corresponding to input key
+        """
+        if key == _EMPTY_KEY or key == _TOMBSTONE_KEY:
+            special_index = self._find_special_index(key)
+            if special_index != -1:
+                return self.special_entries[special_index][1]
+        else:
+            index = self._find_slot(key)
+            if index != -1:
+                return self.value_array[index]
+
+        raise KeyError('Key not found in hash table.')
+
+    def contains(self, key):
+        """Return True if key is stored in hash table, False if not
+        """
+        if key == _EMPTY_KEY or key == _TOMBSTONE_KEY:
+            return self._find_special_index(key) != -1
+
+        return self._find_slot(key) != -1
+
+    def delete(self, key):
+        """Delete key, and its value, from hash table, raising a KeyError if
+        key not found
+
+        Parameters
+        ----------
+        key : int
+            Key in key value store
+        """
+        if key == _EMPTY_KEY or key == _TOMBSTONE_KEY:
+            special_index = self._find_special_index(key)
+            if special_index == -1:
+                raise KeyError('Key not found in hash table.')
+            del self.special_entries[special_index]
+            self.size -= 1
+            return
+
+        index = self._find_slot(key)
+
+        if index == -1:
+            raise KeyError('Key not found in hash table.')
+
+        self.key_array[index] = _TOMBSTONE_KEY
+        if self.value_typecode is None:
+            self.value_array[index] = None
+        self.size -= 1
+        self.num_tombstones += 1
+
+    def _resize(self, capacity):
+        """Rehash every entry into new arrays of length capacity, discarding
+        deleted slots
+
+        Parameters
+        ----------
+        capacity : int
+            Number of slots in new arrays
+        """
+        old_keys = self.key_array
+        old_values = self.value_array
+
+        self._allocate(capacity)
+        self.num_tombstones = 0
+
+        key_array = self.key_array
+        value_array = self.value_array
+
+        for key, value in zip(old_keys, old_values):
+            if key == _EMPTY_KEY or key == _TOMBSTONE_KEY:
+                continue
+
+            # Keys are known to be distinct, so just find first empty slot
+            index = (_mix64(key) * capacity) >> 64
+            while key_array[index] != _EMPTY_KEY:
+                index += 1
+                if index == capacity:
+                    index = 0
+
+            key_array[index] = key
+            value_array[index] = value
+
+    def reserve(self, n):
+        """Resize arrays up front so that n entries can be stored without
+        exceeding max_load_factor. Never shrinks arrays.
+
+        Parameters
+        ----------
+        n : int
+            Number of entries to make room for
+        """
+        capacity = int(math.ceil(n / self.max_load_factor)) + 1
+
+        if capacity > self.num_elements:
+            self._resize(capacity)
+
+    def load_factor(self):
+        """Return ratio of stored entries to number of slots
+        """
+        return self.size / self.num_elements
+
+    def bytes_per_entry(self):
+        """Return bytes used by the key and value arrays per stored entry.
+        With value_typecode None, only counts the list's pointers, not the
+        value objects themselves.
+
+        Returns
+        -------
+        float
+            Array bytes divided by number of entries
+        """
+        key_bytes = self.key_array.itemsize * len(self.key_array)
+
+        if self.value_typecode is None:
+            value_bytes = struct.calcsize('P') * len(self.value_array)
+        else:
+            value_bytes = self.value_array.itemsize * len(self.value_array)
+
+        return (key_bytes + value_bytes) / max(1, self.size)
+
+    def key_buffer(self):
+        """Return a zero-copy memoryview of the key array, one signed 64-bit
+        integer per slot. Empty and deleted slots hold -2**63 and -2**63 + 1.
+
+        The view tracks changes made in place, but resizing (on insert, or
+        reserve) moves the table to new arrays, after which the view is a
+        stale snapshot of the old ones. Call key_buffer again after inserting.
+
+        Returns
+        -------
+        memoryview
+            View of key array, with format 'q'
+        """
+        return memoryview(self.key_array)
+
+    def value_buffer(self):
+        """Return a zero-copy memoryview of the value array, aligned with
+        key_buffer, and likewise stale once the table resizes. Only available
+        if value_typecode was given.
+
+        Returns
+        -------
+        memoryview
+            View of value array, with format value_typecode
+        """
+        if self.value_typecode is None:
+            raise TypeError(
+                'value_buffer needs IntHashTable created with value_typecode'
+            )
+
+        return memoryview(self.value_array)
+
+
+if __name__ == '__main__':
+
+    from data_structures.arrays_and_strings.hash_table import HashTable
+
+    t = IntHashTable(value_typecode='d')
+    t.insert(2 ** 40, 1.5)
+    t.insert(-7, 2.5)
+    print(t.retrieve(2 ** 40), t.retrieve(-7))
+
+    keys = t.key_buffer()
+    print('slots:', len(keys), 'format:', keys.format)
+    keys.release()
+
+    # Compare memory per entry against HashTable. Since arrays double in
+    # length when full, IntHashTable's usage depends on how full they are;
+    # reserve sizes them for the final number of entries up front
+    num_keys = 200000
+    for table_name in ('HashTable', 'IntHashTable', 'IntHashTable reserved'):
+        tracemalloc.start()
+        if table_name == 'HashTable':
+            table = HashTable(8)
+        else:
+            table = IntHashTable(value_typecode='d')
+            if table_name == 'IntHashTable reserved':
+                table.reserve(num_keys)
+        start = time.perf_counter()
+        for i in range(num_keys):
+            table.insert(i * 7919, float(i))
+        insert_time = time.perf_counter() - start
+        memory_used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        print('{}: {:.1f} bytes per entry, insert {:.3f}s'.format(
+            table_name, memory_used / num_keys, insert_time
+        ))
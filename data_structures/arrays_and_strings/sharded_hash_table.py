@@ -0,0 +1,246 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from data_structures.arrays_and_strings.hash_table import (
+    HashTable, _FIBONACCI_MULTIPLIER, _MASK_64
+)
+
+
+# Sentinel passed to compute functions for keys not in the hash table, and
+# returned by them to delete a key
+MISSING = object()
+
+
+class ShardedHashTable():
+    """Class to represent a thread-safe hash table.
+
+    Keys are split across num_shards independent HashTable objects (shards),
+    each guarded by its own lock, so threads working on keys in different
+    shards don't wait on each other. Every method holds at most one shard's
+    lock at a time.
+    """
+
+    def __init__(self, num_shards=16, num_elements=16, **kwargs):
+        """Initialise num_shards empty HashTable objects, and a lock for each
+
+        Parameters
+        ----------
+        num_shards : int, optional
+            Number of independent sub-tables
+        num_elements : int, optional
+            Initial array size of each sub-table
+        **kwargs
+            Passed on to each HashTable (e.g. max_load_factor). A
+            hash_function given here also picks each key's shard
+        """
+        # Same hash function as the shards, so that a stable one (e.g.
+        # fnv1a_hash) gives the same shard for a key in every process
+        self.hash_function = kwargs.get('hash_function', hash)
+
+        self.shards = [
+            HashTable(num_elements, **kwargs) for i in range(num_shards)
+        ]
+        self.locks = [threading.Lock() for i in range(num_shards)]
+        self.num_shards = num_shards
+
+    def _shard_index(self, key):
+        """Map key to the index of the shard that stores it.
+
+        The hash is scrambled first, since each HashTable also takes
+        hash_function(key) modulo its array length; using hash_function(key)
+        modulo num_shards directly would put all of a shard's keys in a few
+        linked lists.
+
+        Parameters
+        ----------
+        key
+            Key in key value store. Can be any non-mutable data type
+
+        Returns
+        -------
+        int
+            Index in shards (and locks)
+        """
+        scrambled = (
+            self.hash_function(key) * _FIBONACCI_MULTIPLIER
+        ) & _MASK_64
+
+        return (scrambled >> 32) % self.num_shards
+
+    def insert(self, key, value):
+        """Insert key, value pair, overwriting the value of key if present
+
+        Parameters
+        ----------
+        key
+            Key in key value store. Can be any non-mutable data type
+        value
+            Can be any python object
+        """
+        shard_index = self._shard_index(key)
+
+        with self.locks[shard_index]:
+            self.shards[shard_index].insert(key, value)
+
+    def retrieve(self, key):
+        """Retrieve a value based on its key, raising a KeyError if key not
+        found
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed)
+
+        Returns
+        -------
+        Value corresponding to input key. Can be any python object.
+        """
+        shard_index = self._shard_index(key)
+
+        # HashTable.retrieve may do incremental rehashing work, so must also
+        # hold the lock
+        with self.locks[shard_index]:
+            return self.shards[shard_index].retrieve(key)
+
+    def contains(self, key):
+        """Return True if key is stored in hash table, False if not
+        """
+        shard_index = self._shard_index(key)
+
+        with self.locks[shard_index]:
+            return self.shards[shard_index].contains(key)
+
+    def delete(self, key):
+        """Delete key, and its value, raising a KeyError if key not found
+        """
+        shard_index = self._shard_index(key)
+
+        with self.locks[shard_index]:
+            self.shards[shard_index].delete(key)
+
+    def get_or_insert(self, key, default_factory):
+        """Atomically return the value of key, first inserting the result of
+        default_factory() if key is not present.
+
+        default_factory is called at most once, while the shard's lock is
+        held, so must not access this hash table.
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed)
+        default_factory : function
+            Called with no arguments to create value for a missing key
+
+        Returns
+        -------
+        Value corresponding to input key (existing, or newly inserted)
+        """
+        shard_index = self._shard_index(key)
+        shard = self.shards[shard_index]
+
+        with self.locks[shard_index]:
+            try:
+                return shard.retrieve(key)
+            except KeyError:
+                value = default_factory()
+                shard.insert(key, value)
+                return value
+
+    def compute(self, key, function):
+        """Atomically replace the value of key with function(current value).
+
+        function is passed MISSING if key is not present, and may return
+        MISSING to delete key. It is called while the shard's lock is held,
+        so must not access this hash table.
+
+        Parameters
+        ----------
+        key
+            Key in key value store (un-hashed)
+        function : function
+            Maps current value (or MISSING) to new value (or MISSING)
+
+        Returns
+        -------
+        New value of key, or MISSING if key was deleted
+        """
+        shard_index = self._shard_index(key)
+        shard = self.shards[shard_index]
+
+        with self.locks[shard_index]:
+            try:
+                current_value = shard.retrieve(key)
+            except KeyError:
+                current_value = MISSING
+
+            value = function(current_value)
+
+            if value is not MISSING:
+                shard.insert(key, value)
+            elif current_value is not MISSING:
+                shard.delete(key)
+
+            return value
+
+    def size(self):
+        """Return total number of key, value pairs across all shards
+
+        Takes each shard's lock in turn, so under concurrent modification the
+        result is not a snapshot of any single moment.
+
+        Returns
+        -------
+        int
+            Number of stored entries
+        """
+        total = 0
+
+        for lock, shard in zip(self.locks, self.shards):
+            with lock:
+                total += shard.size
+
+        return total
+
+
+if __name__ == '__main__':
+
+    s = ShardedHashTable(num_shards=8)
+
+    s.insert('a', 1)
+    print(s.retrieve('a'))
+    print(s.get_or_insert('b', list))
+    print(s.compute('a', lambda value: value + 1))
+
+    # Stress test: many threads incrementing shared counters, and appending
+    # to shared lists, must not lose any updates
+    num_threads = 16
+    increments_per_thread = 5000
+    num_keys = 100
+
+    def increment(value):
+        return 1 if value is MISSING else value + 1
+
+    def hammer(thread_index):
+        for i in range(increments_per_thread):
+            key = (thread_index + i) % num_keys
+            s.compute(key, increment)
+            s.get_or_insert(('list', key), list).append(thread_index)
+
+    # Switch threads as often as possible, to maximise contention
+    sys.setswitchinterval(1e-6)
+
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        list(executor.map(hammer, range(num_threads)))
+
+    total_count = sum(s.retrieve(key) for key in range(num_keys))
+    total_appends = sum(
+        len(s.retrieve(('list', key))) for key in range(num_keys)
+    )
+
+    assert total_count == num_threads * increments_per_thread
+    assert total_appends == num_threads * increments_per_thread
+    print('{} threads x {} updates: no updates lost'.format(
+        num_threads, increments_per_thread
+    ))
@@ -1,39 +1,312 @@
+import io
+import math
+import os
+import struct
+import time
+import tracemalloc
+
+
+# Small strings are joined into leaves of up to this many characters, so the
+# rope doesn't need a node per appended string
+_MAX_LEAF_LENGTH = 1024
+
+
+class RopeNode():
+    """Class to represent a node in a rope: a balanced binary tree of string
+    chunks, whose in-order leaves make up the full string.
+
+    Leaves hold a chunk of text; internal nodes hold their total length and
+    height. Nodes are never modified once created, so ropes can share
+    subtrees with each other (structural sharing), and a new rope built from
+    an old one leaves the old one unchanged.
+    """
+
+    __slots__ = ('left', 'right', 'text', 'length', 'height')
+
+    def __init__(self, left=None, right=None, text=None):
+        """Create leaf holding text, or internal node joining left and right
+
+        Parameters
+        ----------
+        left : RopeNode, optional
+            Left subtree of internal node
+        right : RopeNode, optional
+            Right subtree of internal node
+        text : str, optional
+            Text of leaf
+        """
+        self.left = left
+        self.right = right
+        self.text = text
+
+        if text is not None:
+            self.length = len(text)
+            self.height = 1
+        else:
+            self.length = left.length + right.length
+            self.height = max(left.height, right.height) + 1
+
+
+def _height(node):
+    return 0 if node is None else node.height
+
+
+def _balance(left, right):
+    """Join two AVL balanced ropes whose heights differ by at most 2 under a
+    new node, rotating if needed to keep it balanced
+    """
+    if left.height > right.height + 1:
+        if _height(left.left) >= _height(left.right):
+            return RopeNode(left.left, RopeNode(left.right, right))
+        return RopeNode(
+            RopeNode(left.left, left.right.left),
+            RopeNode(left.right.right, right)
+        )
+
+    if right.height > left.height + 1:
+        if _height(right.right) >= _height(right.left):
+            return RopeNode(RopeNode(left, right.left), right.right)
+        return RopeNode(
+            RopeNode(left, right.left.left),
+            RopeNode(right.left.right, right.right)
+        )
+
+    return RopeNode(left, right)
+
+
+def _concat(left, right):
+    """Return balanced rope of left followed by right, in O(log n) time.
+
+    The shorter rope is joined onto the spine of the taller one at a subtree
+    of similar height, rebalancing on the way back up; only nodes on that
+    path are created, the rest are shared.
+
+    Parameters
+    ----------
+    left, right : RopeNode or None
+        Ropes to join (None for empty)
+
+    Returns
+    -------
+    RopeNode or None
+        Joined rope
+    """
+    if left is None:
+        return right
+    if right is None:
+        return left
+
+    if left.height > right.height + 1:
+        return _balance(left.left, _concat(left.right, right))
+    if right.height > left.height + 1:
+        return _balance(_concat(left, right.left), right.right)
+
+    return RopeNode(left, right)
+
+
+def _build(leaves, start, stop):
+    """Return perfectly balanced rope of leaves[start:stop], or None if empty
+    """
+    if start >= stop:
+        return None
+    if stop - start == 1:
+        return leaves[start]
+
+    middle = (start + stop) // 2
+    return RopeNode(
+        _build(leaves, start, middle), _build(leaves, middle, stop)
+    )
+
+
+def _replace_last_leaf(node, text):
+    """Return copy of rope with its last leaf's text replaced; only the
+    nodes on the path to that leaf are copied
+    """
+    if node.text is not None:
+        return RopeNode(text=text)
+
+    return RopeNode(node.left, _replace_last_leaf(node.right, text))
+
+
+def _slice(node, start, stop):
+    """Return rope of characters start to stop of node, sharing every
+    subtree that lies wholly inside the range
+
+    Parameters
+    ----------
+    node : RopeNode or None
+        Rope to slice (None for empty)
+    start, stop : int
+        Range of characters; clamped to the rope's length
+
+    Returns
+    -------
+    RopeNode or None
+        Sliced rope (None for empty)
+    """
+    if node is None:
+        return None
+
+    start = max(0, start)
+    stop = min(stop, node.length)
+
+    if start >= stop:
+        return None
+    if start == 0 and stop == node.length:
+        return node
+    if node.text is not None:
+        return RopeNode(text=node.text[start:stop])
+
+    left_length = node.left.length
+
+    return _concat(
+        _slice(node.left, start, min(stop, left_length)),
+        _slice(node.right, start - left_length, stop - left_length)
+    )
+
+
+def _iter_leaves(node):
+    """Yield text of each leaf of rope, in order
+    """
+    stack = [] if node is None else [node]
+
+    while stack:
+        node = stack.pop()
+        if node.text is not None:
+            yield node.text
+        else:
+            stack.append(node.right)
+            stack.append(node.left)
+
+
 class StringBuilder():
     """This class implements a string like object, which is actually a list of
     strings, which are only concatenated into a single string when required,
     for efficiency reasons.
+
+    The strings are stored in a rope: an AVL balanced binary tree of string
+    chunks (leaves), with small strings merged into leaves of up to 1024
+    characters. Ropes are immutable, so + builds a new rope sharing all but
+    O(log n) nodes with the original, in O(log n) time, rather than copying
+    every string. len is O(1), and indexing and slicing O(log n).
+
+    to_string caches its result until the next change, and replaces the rope
+    with a single leaf of the joined string, so the next join only walks
+    that leaf and any strings appended since.
     """
 
     def __init__(self):
-        """Intialise empty list, to store strings
+        """Intialise empty rope, to store strings
+        """
+        self.rope = None
+
+        # Result of last to_string, and the rope it was joined from. Valid
+        # while that is still the current rope, since ropes never change
+        self.cached_rope = None
+        self.cached_string = ''
+
+    @property
+    def string_list(self):
+        """Tuple of the rope's string chunks, in order. Read-only: chunks are
+        added with append or extend, not by mutating string_list
+        """
+        return tuple(_iter_leaves(self.rope))
+
+    def _leaves(self, strings):
+        """Return leaves for strings, joining runs of small strings into
+        leaves of up to _MAX_LEAF_LENGTH characters, and skipping empty
+        strings
+        """
+        leaves = []
+        run = []
+        run_length = 0
+
+        for string in strings:
+            if not string:
+                continue
+
+            if run and run_length + len(string) > _MAX_LEAF_LENGTH:
+                leaves.append(RopeNode(text=''.join(run)))
+                run = []
+                run_length = 0
+
+            run.append(string)
+            run_length += len(string)
+
+        if run:
+            leaves.append(RopeNode(text=''.join(run)))
+
+        return leaves
+
+    def _appended_rope(self, strings):
+        """Return rope of this object's strings followed by strings, leaving
+        this object's rope unchanged
+
+        Parameters
+        ----------
+        strings : iterable of str
+            Strings to append
+
+        Returns
+        -------
+        RopeNode or None
+            New rope
         """
-        self.string_list = []
+        leaves = self._leaves(strings)
+        rope = self.rope
+
+        if not leaves:
+            return rope
+
+        # Merge first new leaf into the rope's last leaf, if both are small
+        if rope is not None:
+            last_node = rope
+            while last_node.text is None:
+                last_node = last_node.right
+
+            if last_node.length + leaves[0].length <= _MAX_LEAF_LENGTH:
+                rope = _replace_last_leaf(
+                    rope, last_node.text + leaves[0].text
+                )
+                leaves = leaves[1:]
+
+        return _concat(rope, _build(leaves, 0, len(leaves)))
 
     def append(self, *args):
-        """Append input strings to object's list of strings (string_list)
+        """Append input strings to object's rope of strings
 
         Parameters
         ----------
         *args : str
             Variable amount of strings to append
         """
-        for string in args:
-            self.string_list.append(string)
+        self.rope = self._appended_rope(args)
 
     def to_string(self):
-        """Return list of strings as a single list
+        """Return list of strings as a single list, joining them only if
+        strings have been added since the last call
 
         Returns
         -------
         str
             Joined list of strings
         """
-        return ''.join(self.string_list)
+        if self.rope is None or self.rope is self.cached_rope:
+            return self.cached_string if self.rope is not None else ''
+
+        joined = ''.join(_iter_leaves(self.rope))
+
+        # Collapse rope into one leaf, so later joins needn't walk its leaves
+        self.rope = RopeNode(text=joined)
+        self.cached_rope = self.rope
+        self.cached_string = joined
+
+        return joined
 
     def extend(self, list_of_strings):
-        """Extend string_list with input list of strings
+        """Extend rope with input list of strings
         """
-        self.string_list.extend(list_of_strings)
+        self.rope = self._appended_rope(list_of_strings)
 
     def __add__(self, input_strings):
         """Overload add operator. Append input strings and return StringBuilder
@@ -41,32 +314,335 @@ class StringBuilder():
 
         Parameters
         ----------
-        input_strings : str or list of str
+        input_strings : str, list of str or StringBuilder
             Strings to append
 
         Returns
         -------
         temp_self : StringBuilder
-            Copy of self, with input_args added
+            New object, sharing most of its rope with self, with input_args
+            added
         """
+        temp_self = StringBuilder()
 
-        # Ensure input is list, to allow always using extend method on input
+        # Another StringBuilder's rope can be joined on whole
+        if isinstance(input_strings, StringBuilder):
+            temp_self.rope = _concat(self.rope, input_strings.rope)
+            return temp_self
+
+        # Ensure input is list, to allow always treating input as a list
         if type(input_strings) != list:
             input_strings = [input_strings]
 
-        # Create copy of self, to return
-        current_string_list = self.string_list.copy()
-        temp_self = StringBuilder()
-        temp_self.extend(current_string_list)
-
-        # Add input strings
-        temp_self.extend(input_strings)
+        temp_self.rope = self._appended_rope(input_strings)
 
         return temp_self
 
+    def __len__(self):
+        """Return total number of characters, in O(1) time: every rope node
+        stores its length
+        """
+        return 0 if self.rope is None else self.rope.length
+
+    def __getitem__(self, index):
+        """Return character at index, or a slice of the string.
+
+        Parameters
+        ----------
+        index : int or slice
+            Position of character (negative counts from end), or slice
+
+        Returns
+        -------
+        str or StringBuilder
+            Character at index, or new StringBuilder of slice, sharing
+            subtrees with this one where possible
+        """
+        length = len(self)
+
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+            sliced = StringBuilder()
+
+            if step == 1:
+                sliced.rope = _slice(self.rope, start, stop)
+            else:
+                sliced.append(self.to_string()[index])
+
+            return sliced
+
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('StringBuilder index out of range')
+
+        # Walk down to leaf holding index
+        node = self.rope
+        while node.text is None:
+            if index < node.left.length:
+                node = node.left
+            else:
+                index -= node.left.length
+                node = node.right
+
+        return node.text[index]
+
+    def __str__(self):
+        return self.to_string()
+
+
+class StreamingStringBuilder():
+    """This class implements a string builder that writes its strings to a
+    sink (a file-like object or socket) as it goes, rather than holding them
+    all in memory.
+
+    Appended strings are buffered until they total threshold bytes, then
+    written to the sink in one call: writelines for file-like sinks, or
+    sendall (of the joined, encoded strings) for sockets. So memory use stays
+    below about threshold bytes, plus the largest single string, however
+    much is written.
+    """
+
+    def __init__(self, sink, threshold=1 << 16, encoding='utf-8'):
+        """Initialise empty buffer, attached to sink
+
+        Parameters
+        ----------
+        sink : file-like object or socket
+            Text file (strings written as they are), binary file or socket
+            (strings encoded with encoding first). Must have a writelines or
+            sendall method
+        threshold : int, optional
+            Number of buffered bytes (characters, for text sinks) at which
+            the buffer is flushed
+        encoding : str, optional
+            Encoding for binary sinks
+        """
+        self.sink = sink
+        self.threshold = threshold
+        self.encoding = encoding
+
+        self.text_sink = isinstance(sink, io.TextIOBase)
+        if not hasattr(sink, 'writelines') and not hasattr(sink, 'sendall'):
+            raise TypeError('sink needs a writelines or sendall method')
+
+        self.buffer = []
+        self.buffered_bytes = 0
+
+        # Bytes (characters, for text sinks) written to sink so far, and
+        # number of writes
+        self.bytes_written = 0
+        self.flush_count = 0
+
+    def append(self, *args):
+        """Buffer input strings, flushing buffer to sink if it reaches
+        threshold
+
+        Parameters
+        ----------
+        *args : str
+            Variable amount of strings to append
+        """
+        self.extend(args)
+
+    def extend(self, list_of_strings):
+        """Buffer strings from input iterable, flushing buffer to sink each
+        time it reaches threshold
+        """
+        buffer = self.buffer
+
+        for string in list_of_strings:
+            if not self.text_sink:
+                string = string.encode(self.encoding)
+
+            buffer.append(string)
+            self.buffered_bytes += len(string)
+
+            if self.buffered_bytes >= self.threshold:
+                self.flush()
+                buffer = self.buffer
+
+    def flush(self):
+        """Write buffered strings to sink in one call, and empty buffer
+        """
+        if not self.buffer:
+            return
+
+        if hasattr(self.sink, 'writelines'):
+            self.sink.writelines(self.buffer)
+        else:
+            self.sink.sendall(b''.join(self.buffer))
+
+        self.bytes_written += self.buffered_bytes
+        self.flush_count += 1
+
+        self.buffer = []
+        self.buffered_bytes = 0
+
+    def close(self):
+        """Flush remaining strings. Does not close the sink.
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class BytesBuilder():
+    """This class implements a builder for bytes, e.g. network protocol
+    frames, appending into a bytearray that is grown like ArrayList's
+    underlying list: by resizing_factor when full, or straight to the size
+    needed, so the bytes are never joined or copied into a new object.
+
+    The filled region can be handed to a socket or file without copying,
+    using to_memoryview.
+    """
+
+    def __init__(self, initial_length=64, resizing_factor=2):
+        """Initialise empty builder
+
+        Parameters
+        ----------
+        initial_length : int, optional
+            Starting length of underlying bytearray
+        resizing_factor : int or float, optional
+            Factor by which to multiply bytearray length when it needs
+            resizing; must be above 1
+        """
+        if resizing_factor <= 1:
+            raise ValueError('resizing_factor must be greater than 1')
+
+        self.buffer = bytearray(initial_length)
+        self.num_bytes = 0
+        self.resizing_factor = resizing_factor
+
+        # Number of times buffer has been resized
+        self.resize_count = 0
+
+    def _make_room(self, num_bytes):
+        """Grow buffer, if needed, so that num_bytes more bytes fit, and
+        return offset at which to write them. Callers advance num_bytes only
+        once the write succeeds, so a failed write appends nothing.
+
+        Raises BufferError while a memoryview of the buffer is held.
+        """
+        offset = self.num_bytes
+        needed = offset + num_bytes
+
+        if needed > len(self.buffer):
+            new_length = max(
+                int(math.ceil(self.resizing_factor * len(self.buffer))),
+                needed
+            )
+            self.buffer.extend(bytes(new_length - len(self.buffer)))
+            self.resize_count += 1
+
+        return offset
+
+    def reserve(self, capacity):
+        """Grow buffer, in one step, so that it can hold capacity bytes
+        without further resizing. Never shrinks buffer.
+        """
+        if capacity > len(self.buffer):
+            self.buffer.extend(bytes(capacity - len(self.buffer)))
+            self.resize_count += 1
+
+    def append(self, *args):
+        """Append input bytes-like objects
+
+        Parameters
+        ----------
+        *args : bytes, bytearray or memoryview
+            Variable amount of bytes to append
+        """
+        for data in args:
+            num_bytes = len(data) if isinstance(data, bytes) else (
+                memoryview(data).nbytes
+            )
+            offset = self._make_room(num_bytes)
+            self.buffer[offset:offset + num_bytes] = data
+            self.num_bytes = offset + num_bytes
+
+    def append_int(self, value, length=4, byteorder='little', signed=False):
+        """Append integer as length bytes
+
+        Parameters
+        ----------
+        value : int
+            Integer to append
+        length : int, optional
+            Number of bytes
+        byteorder : str, optional
+            'little' or 'big' (network order)
+        signed : bool, optional
+            Whether to use two's complement for negative values
+        """
+        # Encode first, as this raises an OverflowError if value doesn't fit
+        data = value.to_bytes(length, byteorder, signed=signed)
+
+        offset = self._make_room(length)
+        self.buffer[offset:offset + length] = data
+        self.num_bytes = offset + length
+
+    def append_struct(self, format, *values):
+        """Pack values with struct format straight into buffer
+
+        Parameters
+        ----------
+        format : str or struct.Struct
+            struct format, e.g. '!HI' for a network order 2 byte and 4 byte
+            integer
+        *values
+            Values to pack
+        """
+        if not isinstance(format, struct.Struct):
+            format = struct.Struct(format)
+
+        offset = self._make_room(format.size)
+        format.pack_into(self.buffer, offset, *values)
+        self.num_bytes = offset + format.size
+
+    def to_memoryview(self):
+        """Returns a zero-copy view of the filled region of buffer.
+
+        The view must be released (memoryview.release, or a with block)
+        before appending more bytes, as buffer can't be resized while it is
+        exported.
+
+        Returns
+        -------
+        memoryview
+            View of first num_bytes bytes of buffer
+        """
+        return memoryview(self.buffer)[:self.num_bytes]
+
+    def __buffer__(self, flags):
+        """Implement the buffer protocol (Python 3.12+, PEP 688). Wraps this
+        object's to_memoryview method.
+        """
+        return self.to_memoryview()
+
+    def to_bytes(self):
+        """Return a copy of the filled region of buffer, as bytes
+        """
+        return bytes(self.to_memoryview())
+
+    def clear(self):
+        """Empty builder, keeping buffer allocated for reuse
+        """
+        self.num_bytes = 0
+
+    def __len__(self):
+        return self.num_bytes
+
 
 if __name__ == '__main__':
 
+    import socket
+
     s = StringBuilder()
 
     s.append('Hello', ' ', 'world')
@@ -77,3 +653,125 @@ if __name__ == '__main__':
     print(s.to_string())
 
     print(s2.to_string())
+
+    print(len(s2), s2[4], s2[-9:].to_string())
+
+    # Building a string with repeated +: time per + stays roughly constant as
+    # the string grows, where copying the list of strings made it linear
+    for num_additions in (10 ** 3, 10 ** 4, 10 ** 5):
+        s = StringBuilder()
+        start = time.perf_counter()
+        for i in range(num_additions):
+            s = s + 'word{} '.format(i)
+        add_time = time.perf_counter() - start
+
+        print('{} additions: {:.2f} microseconds per +, {} characters'.format(
+            num_additions, add_time / num_additions * 1e6, len(s)
+        ))
+
+    # Interleaved appends and reads: each to_string only joins the previous
+    # result with strings appended since, and repeated reads are free,
+    # against joining every string each time
+    num_appends = 20000
+
+    def join_every_string(s):
+        return ''.join(s.string_list)
+
+    for name, read in (('cached to_string', StringBuilder.to_string),
+                       ('join every string', join_every_string)):
+        s = StringBuilder()
+        start = time.perf_counter()
+        for i in range(num_appends):
+            s.append('word{} '.format(i))
+            if i % 10 == 0:
+                read(s)
+                read(s)
+        read_time = time.perf_counter() - start
+
+        print('{} appends, reading twice every 10: {} {:.3f}s'.format(
+            num_appends, name, read_time
+        ))
+
+    # Peak memory writing a large body: streamed to a file, against built
+    # in memory then written. Streaming stays near threshold as size grows
+    line = 'x' * 99 + '\n'
+
+    for num_lines in (10 ** 5, 10 ** 6):
+        with open(os.devnull, 'wb') as sink:
+            tracemalloc.start()
+            with StreamingStringBuilder(sink) as streaming:
+                for i in range(num_lines):
+                    streaming.append(line)
+            streaming_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            tracemalloc.start()
+            s = StringBuilder()
+            for i in range(num_lines):
+                s.append(line)
+            sink.write(s.to_string().encode('utf-8'))
+            in_memory_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        print(
+            '{} bytes: streaming peak {} bytes ({} flushes), in memory peak '
+            '{} bytes'.format(
+                streaming.bytes_written, streaming_peak,
+                streaming.flush_count, in_memory_peak
+            )
+        )
+
+    # Build length-prefixed frames into one reused buffer, and send them
+    # without copying
+    frame_header = struct.Struct('!HI')
+    sender, receiver = socket.socketpair()
+
+    frame = BytesBuilder()
+    for message_type, payload in ((1, b'hello'), (2, b'world' * 100)):
+        frame.clear()
+        frame.append_struct(frame_header, message_type, len(payload))
+        frame.append(payload)
+        frame.append_int(0xCAFE, 2, 'big')
+
+        with frame.to_memoryview() as view:
+            sender.sendall(view)
+
+        received = receiver.recv(len(frame), socket.MSG_WAITALL)
+        print(frame_header.unpack_from(received), len(received),
+              received[-2:].hex())
+
+    sender.close()
+    receiver.close()
+    print('resizes:', frame.resize_count)
+
+    # Appending many small fields: BytesBuilder against building a list of
+    # bytes and joining it, by time and peak memory
+    num_fields = 10 ** 5
+    field = struct.Struct('<I')
+
+    def list_and_join():
+        fields = []
+        for i in range(num_fields):
+            fields.append(field.pack(i))
+        return b''.join(fields)
+
+    def bytes_builder():
+        builder = BytesBuilder()
+        for i in range(num_fields):
+            builder.append_struct(field, i)
+        return builder.to_memoryview()
+
+    for name, build in (('list and join', list_and_join),
+                        ('BytesBuilder', bytes_builder)):
+        start = time.perf_counter()
+        build()
+        build_time = time.perf_counter() - start
+
+        tracemalloc.start()
+        build()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print('{} fields, {}: {:.3f}s, peak {} bytes'.format(
+            num_fields, name, build_time, peak_memory
+        ))
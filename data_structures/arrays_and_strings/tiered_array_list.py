@@ -0,0 +1,336 @@
+import itertools
+import math
+import random
+import time
+
+from data_structures.arrays_and_strings.array_list import _format_elements
+
+
+class TieredArrayList():
+    """This class implements a list split into chunks (a tiered vector, or
+    square root decomposition), supporting fast insertion and deletion at
+    any position, as well as ArrayList's append, extend and to_list.
+
+    Each chunk is a Python list holding around sqrt(n) elements. A Fenwick
+    tree (binary indexed tree) of chunk lengths finds the chunk holding any
+    index, and is updated when a chunk's length changes, in O(log n) time.
+    So inserting or deleting only moves the O(sqrt(n)) elements after it
+    within one chunk, rather than the O(n) element moves of a flat list.
+
+    Chunks rebalance automatically: one that grows beyond twice the target
+    length is split in two, and one that shrinks below a quarter of it is
+    merged into its neighbour. The target grows with the list, so chunks
+    stay close to sqrt(n) elements long.
+    """
+
+    def __init__(self, min_chunk_length=64):
+        """Initialise empty list
+
+        Parameters
+        ----------
+        min_chunk_length : int, optional
+            Smallest target chunk length, used while sqrt(n) is smaller
+        """
+        self.min_chunk_length = min_chunk_length
+
+        self.chunks = []
+
+        # Fenwick tree of chunk lengths: tree[k] is the total length of
+        # chunks k - (k & -k) to k - 1. None after chunks are added, removed
+        # or split, until next needed
+        self.tree = [0]
+
+        self.num_elements = 0
+
+        # Incremented whenever the number of elements changes, so that
+        # iterators can detect it and fail fast
+        self.modification_count = 0
+
+    def _target_chunk_length(self):
+        """Return ideal chunk length for the current number of elements
+        """
+        return max(self.min_chunk_length, math.isqrt(self.num_elements))
+
+    def _get_tree(self):
+        """Return Fenwick tree of chunk lengths, rebuilding it in O(number of
+        chunks) time if out of date
+        """
+        if self.tree is None:
+            tree = [0]
+            tree.extend(map(len, self.chunks))
+
+            for k in range(1, len(tree)):
+                parent = k + (k & -k)
+                if parent < len(tree):
+                    tree[parent] += tree[k]
+
+            self.tree = tree
+
+        return self.tree
+
+    def _add_to_chunk_length(self, chunk_index, change):
+        """Update Fenwick tree (if built) for a change in length of a chunk
+        """
+        tree = self.tree
+        if tree is None:
+            return
+
+        k = chunk_index + 1
+        while k < len(tree):
+            tree[k] += change
+            k += k & -k
+
+    def _locate(self, index):
+        """Return (chunk index, index within chunk) of element at index,
+        raising an IndexError if it is out of range. Negative indexes count
+        from the end.
+        """
+        if index < 0:
+            index += self.num_elements
+
+        if not 0 <= index < self.num_elements:
+            raise IndexError('TieredArrayList index out of range')
+
+        # Descend Fenwick tree, skipping whole ranges of chunks that end at
+        # or before index
+        tree = self._get_tree()
+        chunk_index = 0
+        step = 1 << (len(tree).bit_length() - 1)
+
+        while step:
+            next_index = chunk_index + step
+            if next_index < len(tree) and tree[next_index] <= index:
+                chunk_index = next_index
+                index -= tree[next_index]
+            step >>= 1
+
+        return chunk_index, index
+
+    def append(self, data):
+        """Add single data element to end of list, starting a new chunk if
+        the last one is full
+
+        Parameters
+        ----------
+        data : any
+            Item to append
+        """
+        if not self.chunks or len(self.chunks[-1]) >= (
+                2 * self._target_chunk_length()):
+            self.chunks.append([])
+            self.tree = None
+
+        self.chunks[-1].append(data)
+        self._add_to_chunk_length(len(self.chunks) - 1, 1)
+
+        self.num_elements += 1
+        self.modification_count += 1
+
+    def extend(self, extension):
+        """Append extension values to end of list, in new chunks of the
+        target length
+
+        Parameters
+        ----------
+        extension : iterable
+            Python objects to append
+        """
+        extension = list(extension)
+
+        # Size chunks for the final number of elements
+        self.num_elements += len(extension)
+        chunk_length = self._target_chunk_length()
+
+        # Top up last chunk, then slice the rest into new chunks
+        if self.chunks:
+            space = 2 * chunk_length - len(self.chunks[-1])
+            if space > 0:
+                self.chunks[-1].extend(extension[:space])
+                extension = extension[space:]
+
+        for start in range(0, len(extension), chunk_length):
+            self.chunks.append(extension[start:start + chunk_length])
+
+        self.tree = None
+        self.modification_count += 1
+
+    def insert(self, index, data):
+        """Insert data before index, like list.insert: indexes beyond the
+        end append, and negative indexes count from the end
+
+        Parameters
+        ----------
+        index : int
+            Position to insert at
+        data : any
+            Item to insert
+        """
+        if index < 0:
+            index = max(0, index + self.num_elements)
+
+        if index >= self.num_elements:
+            self.append(data)
+            return
+
+        chunk_index, position = self._locate(index)
+        chunk = self.chunks[chunk_index]
+        chunk.insert(position, data)
+        self._add_to_chunk_length(chunk_index, 1)
+
+        self.num_elements += 1
+        self.modification_count += 1
+
+        # Split chunk in two if it has grown too long
+        if len(chunk) > 2 * self._target_chunk_length():
+            half = len(chunk) // 2
+            self.chunks[chunk_index + 1:chunk_index + 1] = [chunk[half:]]
+            del chunk[half:]
+            self.tree = None
+
+    def __delitem__(self, index):
+        """Delete element at index
+
+        Parameters
+        ----------
+        index : int
+            Position of element (negative counts from end)
+        """
+        chunk_index, position = self._locate(index)
+        chunk = self.chunks[chunk_index]
+        del chunk[position]
+        self._add_to_chunk_length(chunk_index, -1)
+
+        self.num_elements -= 1
+        self.modification_count += 1
+
+        # Drop chunk if empty, or merge it into a neighbour if it has become
+        # too short, splitting the result again if that is too long
+        if not chunk:
+            del self.chunks[chunk_index]
+            self.tree = None
+        elif (len(chunk) < self._target_chunk_length() // 4 and
+                len(self.chunks) > 1):
+            if chunk_index == len(self.chunks) - 1:
+                chunk_index -= 1
+            merged = self.chunks[chunk_index] + self.chunks[chunk_index + 1]
+
+            if len(merged) > 2 * self._target_chunk_length():
+                half = len(merged) // 2
+                self.chunks[chunk_index:chunk_index + 2] = [
+                    merged[:half], merged[half:]
+                ]
+            else:
+                self.chunks[chunk_index:chunk_index + 2] = [merged]
+
+            self.tree = None
+
+    def pop(self, index=-1):
+        """Remove and return element at index (default last)
+        """
+        if self.num_elements == 0:
+            raise IndexError('pop from empty TieredArrayList')
+
+        data = self[index]
+        del self[index]
+
+        return data
+
+    def __getitem__(self, index):
+        """Return element at index
+
+        Parameters
+        ----------
+        index : int
+            Position of element (negative counts from end)
+
+        Returns
+        -------
+        Element at index
+        """
+        chunk_index, position = self._locate(index)
+        return self.chunks[chunk_index][position]
+
+    def __setitem__(self, index, value):
+        """Replace element at index
+        """
+        chunk_index, position = self._locate(index)
+        self.chunks[chunk_index][position] = value
+
+    def __len__(self):
+        return self.num_elements
+
+    def to_list(self):
+        """Returns object contents, in form of standard Python list.
+
+        Returns
+        -------
+        list
+            Values in all chunks, concatenated into a standard Python list
+        """
+        return list(itertools.chain.from_iterable(self.chunks))
+
+    def __iter__(self):
+        """Walk elements in place, chunk by chunk, raising a RuntimeError if
+        the number of elements changes during iteration
+        """
+        modification_count = self.modification_count
+
+        for chunk in self.chunks:
+            for data in chunk:
+                if self.modification_count != modification_count:
+                    raise RuntimeError(
+                        'TieredArrayList changed size during iteration'
+                    )
+                yield data
+
+    def __str__(self):
+        return _format_elements(self)
+
+
+if __name__ == '__main__':
+
+    from data_structures.arrays_and_strings.array_list import ArrayList
+
+    t = TieredArrayList()
+    t.extend([3, 4, 5])
+    t.append(6)
+    t.insert(0, 2)
+    t.insert(2, 3.5)
+    del t[-1]
+    print(t, len(t), t[2])
+
+    # Random position edits on 10^6 elements, against flat lists: ArrayList
+    # has no insertion, so its backing Python list (where list.insert and del
+    # shift elements with a C memmove) stands in for the flat version
+    num_elements = 10 ** 6
+    num_edits = 2000
+    positions = [random.randrange(num_elements) for i in range(num_edits)]
+
+    flat = ArrayList()
+    flat.extend(range(num_elements))
+    flat_list = flat.to_list()
+
+    tiered = TieredArrayList()
+    tiered.extend(range(num_elements))
+
+    for name, sequence in (('flat list', flat_list), ('tiered', tiered)):
+        start = time.perf_counter()
+        for position in positions:
+            sequence.insert(position, -1)
+        for position in positions:
+            del sequence[position]
+        edit_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for position in positions:
+            sequence[position]
+        read_time = time.perf_counter() - start
+
+        print('{}: {} inserts + {} deletes {:.3f}s, {} reads {:.4f}s'.format(
+            name, num_edits, num_edits, edit_time, num_edits, read_time
+        ))
+
+    assert tiered.to_list() == flat_list
+    print('chunks: {}, longest: {}'.format(
+        len(tiered.chunks), max(len(chunk) for chunk in tiered.chunks)
+    ))
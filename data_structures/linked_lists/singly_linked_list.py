@@ -29,6 +29,10 @@ class LinkedList():
         """
         self.head = None
 
+        # Keep reference to last node, so appending doesn't need to walk the
+        # whole linked list
+        self.tail = None
+
         # Fill LinkedList with data, if given
         self._fill_from_array(input_arr)
 
@@ -55,22 +59,19 @@ class LinkedList():
         data
             Data to store in LinkedList. Can be any python object.
         """
+        new_tail = Node(data)
+
         # If head is None (i.e. empty linked list), put the data there (as
         # first element)
         if self.head is None:
-            self.head = Node(data)
+            self.head = new_tail
+            self.tail = new_tail
             return
 
-        # Start at the head
-        current_node = self.head
-
-        # Walk through linked list until the end
-        while current_node.next_node is not None:
-            current_node = current_node.next_node
-
-        # Create new node at end of linked list, containing the data to be
+        # Create new node after the current tail, containing the data to be
         # added
-        current_node.next_node = Node(data)
+        self.tail.next_node = new_tail
+        self.tail = new_tail
 
     def prepend(self, data):
         """Add data to beginning of linked list
@@ -87,6 +88,10 @@ class LinkedList():
         # Update the current head of the linked list to reference this new node
         self.head = new_head
 
+        # Node is also the tail if linked list was empty
+        if self.tail is None:
+            self.tail = new_head
+
     def delete_first_node_with_value(self, data):
         """Delete the first occurrence of a node with the specified value
 
@@ -105,7 +110,7 @@ class LinkedList():
         # Handle special case of first node containing the specified data, so
         # need to delete first node
         if current_node.data == data:
-            self.head = self.head.next_node
+            self.remove_node(current_node)
             return
 
         # Iterate through linked list until value is found, or end is reached
@@ -113,12 +118,32 @@ class LinkedList():
             # Check if node after current node contains the specified data
             if current_node.next_node.data == data:
                 # Skip over next node
-                current_node.next_node = current_node.next_node.next_node
+                self.remove_node(current_node.next_node, current_node)
                 return
 
             # Go to next node
             current_node = current_node.next_node
 
+    def remove_node(self, node, previous_node=None):
+        """Unlink a node from the linked list in constant time, given the node
+        before it
+
+        Parameters
+        ----------
+        node : Node
+            Node in this LinkedList to remove
+        previous_node : Node, optional
+            Node immediately before node; None if node is the head
+        """
+        if previous_node is None:
+            self.head = node.next_node
+        else:
+            previous_node.next_node = node.next_node
+
+        # Removed node was last in linked list: node before it is new tail
+        if node is self.tail:
+            self.tail = previous_node
+
     def __str__(self):
         """Overload __str__ operator to print all values in LinkedList.
 
@@ -11,7 +11,7 @@ class Stack(LinkedList):
     def _delete_head(self):
         """Delete head node of LinkedList.
         """
-        self.head = self.head.next_node
+        self.remove_node(self.head)
 
     def pop(self):
         """Remove and return the top item from the stack.